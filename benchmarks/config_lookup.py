@@ -0,0 +1,60 @@
+import sys
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "bot"))
+
+from utils.config import Config, UNSET  # noqa: E402
+
+
+def walk_gobj(data: dict, key: str, default=UNSET):
+    parts = key.rsplit(".", 1)
+    child = parts[-1]
+    if len(parts) == 1:
+        parent = data
+    else:
+        parent = walk_gobj(data, parts[0])
+    if child in parent:
+        return parent[child]
+    return default if default is not UNSET else {}
+
+
+def leaf_keys(data: dict, prefix: str = "") -> list:
+    keys = []
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            keys.extend(leaf_keys(value, path + "."))
+        else:
+            keys.append(path)
+    return keys
+
+
+def bench(name: str, number: int = 20000) -> None:
+    config = Config()
+    config.load(ROOT / "config" / name)
+    keys = leaf_keys(config.data)
+
+    def walk():
+        for key in keys:
+            walk_gobj(config.data, key)
+
+    def indexed():
+        for key in keys:
+            config.gobj(key)
+
+    walk_time = min(timeit.repeat(walk, number=number, repeat=3))
+    index_time = min(timeit.repeat(indexed, number=number, repeat=3))
+    lookups = number * len(keys)
+    print(
+        f"{name}: {len(keys)} keys, "
+        f"walk {walk_time / lookups * 1e9:.0f} ns/lookup, "
+        f"index {index_time / lookups * 1e9:.0f} ns/lookup, "
+        f"{walk_time / index_time:.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    bench("config.yaml")
+    bench("language.yaml")
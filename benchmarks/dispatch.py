@@ -0,0 +1,140 @@
+import asyncio
+import json
+import random
+import sys
+import time
+import warnings
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "bot"))
+
+from utils.config import Config, Generation  # noqa: E402
+from utils.dispatch import PrefixDispatcher  # noqa: E402
+from utils.general import compile_string, format_string  # noqa: E402
+from utils.tags import TagCache  # noqa: E402
+
+BOT = object()
+WORDS = "hallo wer hat die hausaufgaben morgen test mathe deutsch bio ok lol danke ja nein".split()
+
+
+async def reply(content) -> None:
+    pass
+
+
+def load_stream(path: Path) -> list:
+    # One JSON object per line, e.g. {"content": "!!dcinvite", "bot": false}
+    messages = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if line.strip():
+            entry = json.loads(line)
+            messages.append((entry["content"], entry.get("bot", False)))
+    return messages
+
+
+def synthetic_stream(tags: Config, count: int = 50000, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    names = list(tags.data)
+    messages = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.02:
+            content = "!!" + (rng.choice(names) if rng.random() < 0.8 else "unbekannt")
+        elif roll < 0.03:
+            content = "!f " + " ".join(rng.choices(WORDS, k=rng.randint(1, 12)))
+        else:
+            content = " ".join(rng.choices(WORDS, k=rng.randint(1, 30)))
+        messages.append((content, rng.random() < 0.01))
+    return messages
+
+
+def build_messages(stream: list) -> list:
+    return [
+        SimpleNamespace(
+            content=content,
+            author=BOT if is_bot else SimpleNamespace(mention="<@1>"),
+            reply=reply,
+        )
+        for content, is_bot in stream
+    ]
+
+
+def legacy_handler(tags: Config):
+    async def on_message(message):
+        if message.author == BOT:
+            return
+        if message.content.startswith("!f "):
+            await message.reply(message.content[3:])
+        if message.content.startswith("!!"):
+            if message.content[2:] not in tags:
+                await message.reply(message.content[2:])
+                return
+            if isinstance(tags[message.content[2:]], dict):
+                await message.reply(message.content[2:])
+                return
+            await message.reply(tags[message.content[2:]])
+
+    return on_message
+
+
+def dispatched_handler(tags: Config):
+    tag_cache = TagCache(tags, Generation())
+    text_commands = PrefixDispatcher()
+
+    @text_commands.command("!f ")
+    async def ex_f(message, text):
+        await message.reply(text)
+
+    @text_commands.command("!!")
+    async def ex_tag(message, name):
+        cached_tag = tag_cache.get(name)
+        if cached_tag is None or cached_tag.is_embed:
+            await message.reply(name)
+            return
+        await message.reply(cached_tag.template)
+
+    async def on_message(message):
+        if message.author == BOT:
+            return
+        await text_commands.dispatch(message)
+
+    return on_message
+
+
+async def replay(handler, messages: list, rounds: int = 5) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for message in messages:
+            await handler(message)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    warnings.simplefilter("ignore", DeprecationWarning)
+    tags = Config(default_to="none")
+    tags.load(ROOT / "config" / "tags.yaml")
+    config = Config()
+    config.load(ROOT / "config" / "config.yaml")
+    format_string.bind(config=config, tags=tags)
+    compile_string.bind(config=config, tags=tags)
+    if len(sys.argv) > 1:
+        stream = load_stream(Path(sys.argv[1]))
+    else:
+        stream = synthetic_stream(tags)
+    messages = build_messages(stream)
+    commands = sum(content.startswith(("!f ", "!!")) for content, _ in stream)
+    legacy = asyncio.run(replay(legacy_handler(tags), messages))
+    dispatched = asyncio.run(replay(dispatched_handler(tags), messages))
+    print(f"{len(messages)} messages, {commands} commands")
+    print(f"legacy:     {legacy / len(messages) * 1e9:.0f} ns/message")
+    print(
+        f"dispatcher: {dispatched / len(messages) * 1e9:.0f} ns/message, "
+        f"{legacy / dispatched:.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
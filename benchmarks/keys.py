@@ -0,0 +1,93 @@
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "bot"))
+
+from utils.config import Key  # noqa: E402
+
+
+class LegacyKey:
+    # Key as it was before paths were interned.
+    def __init__(self, key: Optional[list] = None) -> None:
+        self.key = key or []
+
+    def __getattr__(self, key: str) -> "LegacyKey":
+        key = key.replace("_", "-")
+        if self.key:
+            return LegacyKey(self.key + [key])
+        return LegacyKey([key])
+
+    def __getitem__(self, key: str) -> "LegacyKey":
+        return self.__getattr__(key)
+
+    def __str__(self) -> str:
+        return ".".join(self.key)
+
+    def __call__(self) -> str:
+        return str(self)
+
+
+def lookups(root):
+    # A typical handler's worth of key paths.
+    return lambda: (
+        root.messages.no_permission.to_run_command(),
+        root.messages.announcements.too_large(),
+        root.features.tag_autocomplete.case_insensitive(),
+        root.commands["announcement-create"].description(),
+    )
+
+
+def created_per_call(cls, func, number: int = 1000) -> float:
+    # Counted in a separate pass so the wrapper doesn't skew the timings.
+    func()
+    init, created = cls.__init__, 0
+
+    def counting_init(self, *args, **kwargs):
+        nonlocal created
+        created += 1
+        init(self, *args, **kwargs)
+
+    cls.__init__ = counting_init
+    try:
+        for _ in range(number):
+            func()
+    finally:
+        cls.__init__ = init
+    return created / number
+
+
+def peak_bytes(func, number: int = 1000) -> float:
+    func()
+    tracemalloc.start()
+    total = 0
+    for _ in range(number):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        func()
+        total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return total / number
+
+
+def main(number: int = 200000) -> None:
+    legacy, interned = lookups(LegacyKey()), lookups(Key())
+    legacy_time = min(timeit.repeat(legacy, number=number, repeat=3))
+    interned_time = min(timeit.repeat(interned, number=number, repeat=3))
+    print(
+        f"legacy:   {legacy_time / number * 1e9:.0f} ns/call, "
+        f"{created_per_call(LegacyKey, legacy):g} Key objects/call, "
+        f"{peak_bytes(legacy):.0f} B peak/call"
+    )
+    print(
+        f"interned: {interned_time / number * 1e9:.0f} ns/call, "
+        f"{created_per_call(Key, interned):g} Key objects/call, "
+        f"{peak_bytes(interned):.0f} B peak/call, {legacy_time / interned_time:.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
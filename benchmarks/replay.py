@@ -0,0 +1,445 @@
+"""Replay gateway traffic through the real bot against a fake Discord backend.
+
+    python benchmarks/replay.py --events 20000 --rate 0
+    python benchmarks/replay.py --record stream.jsonl --rate 200
+    python benchmarks/replay.py --duration 600 --rate 50   # soak run
+
+A recording is one gateway dispatch per line: {"t": "MESSAGE_CREATE", "d": {...}}.
+The bot runs from a scratch copy of config/, so nothing in the tree is touched.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import runpy
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+GUILD_ID = 1202175252420120586
+BOT_ID = 1000
+APPLICATION_ID = 1001
+TAG_COMMAND_ID = 1002
+USER_BASE = 10**17
+
+WORDS = ("hallo", "wer", "hat", "die", "hausaufgaben", "morgen", "test", "mathe", "ok")
+
+snowflakes = itertools.count(2 * 10**17)
+
+
+def now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def user_payload(user_id: int, bot: bool = False) -> dict:
+    return {
+        "id": str(user_id),
+        "username": f"user{user_id % 100000}",
+        "global_name": None,
+        "discriminator": "0",
+        "avatar": None,
+        "bot": bot,
+    }
+
+
+def member_payload(user_id: int, roles: list = ()) -> dict:
+    return {
+        "user": user_payload(user_id),
+        "roles": [str(role) for role in roles],
+        "joined_at": now(),
+        "deaf": False,
+        "mute": False,
+        "nick": None,
+        "flags": 0,
+    }
+
+
+def message_payload(channel_id: int, author: dict, content: str = "", **extra) -> dict:
+    return {
+        "id": str(next(snowflakes)),
+        "channel_id": str(channel_id),
+        "guild_id": str(GUILD_ID),
+        "author": author,
+        "content": content,
+        "timestamp": now(),
+        "edited_timestamp": None,
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": [],
+        "pinned": False,
+        "type": 0,
+        **extra,
+    }
+
+
+class Samples:
+    """Drop-in for metrics.Histogram that keeps raw samples for exact percentiles."""
+
+    def __init__(self) -> None:
+        self.values: list = []
+
+    def observe(self, value: float) -> None:
+        self.values.append(value)
+
+    @property
+    def count(self) -> int:
+        return len(self.values)
+
+    def quantile(self, q: float) -> float:
+        if not self.values:
+            return 0.0
+        ordered = sorted(self.values)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class FakeDiscord:
+    """Stands in for the REST API: answers every route with a plausible payload."""
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.calls = Counter()
+        self.bot_user = user_payload(BOT_ID, bot=True)
+        self.handler = None
+
+    def install(self, bot) -> None:
+        from nextcord.webhook.async_ import AsyncWebhookAdapter
+        from utils.metrics import current_handler
+
+        backend = self
+        self.handler = current_handler
+
+        # Interaction responses and followups go through the webhook adapter, not bot.http.
+        async def webhook_request(adapter, route, session, *, payload=None, multipart=None, **_):
+            return await backend.request(route, json=payload, form=multipart)
+
+        AsyncWebhookAdapter.request = webhook_request
+        bot.http.request = self.request
+
+    async def request(self, route, **kwargs):
+        self.calls[(self.handler.get(), route.method, route.path)] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        body = kwargs.get("json") or {}
+        for field in kwargs.get("form") or ():
+            if field.get("name") == "payload_json":
+                body = json.loads(field["value"])
+        path = route.path
+        if route.method == "POST" and path == "/channels/{channel_id}/messages":
+            return message_payload(
+                route.channel_id,
+                self.bot_user,
+                body.get("content") or "",
+                embeds=body.get("embeds") or [],
+            )
+        if route.method == "GET" and path.startswith("/channels/{channel_id}/messages/"):
+            return message_payload(route.channel_id, self.bot_user)
+        if path.startswith("/webhooks/") and path.endswith("/messages/@original"):
+            return message_payload(0, self.bot_user, body.get("content") or "")
+        if route.method == "PATCH" and path == "/guilds/{guild_id}/members/{user_id}":
+            return member_payload(USER_BASE, body.get("roles", []))
+        if path == "/users/@me/channels":
+            return {"id": str(next(snowflakes)), "type": 1, "recipients": []}
+        return {}
+
+
+class Stream:
+    def __init__(self, config: dict, tags: dict, users: int, seed: int) -> None:
+        self.rng = random.Random(seed)
+        self.channels = list(config["channels"].values())
+        self.tags = [name for name, content in tags.items() if isinstance(content, str)]
+        self.react_roles = config["features"]["react-roles"]
+        self.users = users
+        self.mix = {"message": 0.90, "reaction": 0.04, "join": 0.02, "slash": 0.04}
+
+    def user(self) -> int:
+        return USER_BASE + self.rng.randrange(self.users)
+
+    def message(self) -> dict:
+        roll = self.rng.random()
+        if roll < 0.03:
+            content = "!!" + self.rng.choice(self.tags)
+        elif roll < 0.04:
+            content = "!f Hallo @!sender, willkommen in #off-topic>>"
+        else:
+            content = " ".join(self.rng.choices(WORDS, k=self.rng.randint(1, 20)))
+        user = self.user()
+        data = message_payload(self.rng.choice(self.channels), user_payload(user), content)
+        data["member"] = {k: v for k, v in member_payload(user).items() if k != "user"}
+        return {"t": "MESSAGE_CREATE", "d": data}
+
+    def reaction(self) -> dict:
+        entry = self.rng.choice(self.react_roles["roles"])
+        user = self.user()
+        return {
+            "t": "MESSAGE_REACTION_ADD",
+            "d": {
+                "user_id": str(user),
+                "channel_id": str(self.react_roles["channel"]),
+                "message_id": str(self.react_roles["message"]),
+                "guild_id": str(GUILD_ID),
+                "emoji": {"id": None, "name": entry["emoji"]},
+                "member": member_payload(user),
+                "burst": False,
+                "type": 0,
+            },
+        }
+
+    def join(self) -> dict:
+        data = {**member_payload(self.user()), "guild_id": str(GUILD_ID)}
+        return {"t": "GUILD_MEMBER_ADD", "d": data}
+
+    def slash(self) -> dict:
+        user = self.user()
+        return {
+            "t": "INTERACTION_CREATE",
+            "d": {
+                "id": str(next(snowflakes)),
+                "application_id": str(APPLICATION_ID),
+                "type": 2,
+                "token": "fake-token",
+                "version": 1,
+                "guild_id": str(GUILD_ID),
+                "channel_id": str(self.rng.choice(self.channels)),
+                "member": {**member_payload(user), "permissions": "0"},
+                "locale": "de",
+                "guild_locale": "de",
+                "app_permissions": "0",
+                "data": {
+                    # Stable per command, like Discord's; the first use lazily associates it.
+                    "id": str(TAG_COMMAND_ID),
+                    "name": "tag",
+                    "type": 1,
+                    "guild_id": str(GUILD_ID),
+                    "options": [{"name": "tag", "type": 3, "value": self.rng.choice(self.tags)}],
+                },
+            },
+        }
+
+    def __iter__(self):
+        kinds, weights = zip(*self.mix.items())
+        while True:
+            yield getattr(self, self.rng.choices(kinds, weights)[0])()
+
+
+def load_recording(path: Path):
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def load_bot(workdir: Path, backend: FakeDiscord, rate_limits: bool) -> dict:
+    shutil.copytree(
+        ROOT / "config", workdir / "config", ignore=shutil.ignore_patterns(".cache", "*.bak")
+    )
+    if not rate_limits:
+        import yaml
+
+        path = workdir / "config" / "config.yaml"
+        data = yaml.safe_load(path.read_text(encoding="utf-8"))
+        data["features"].pop("rate-limits", None)
+        path.write_text(yaml.dump(data), encoding="utf-8")
+    os.chdir(workdir)
+    os.environ.setdefault("BOT_TOKEN", "replay")
+    sys.path.insert(0, str(ROOT / "bot"))
+    namespace = runpy.run_path(str(ROOT / "bot" / "__main__.py"), run_name="replay")
+    backend.install(namespace["bot"])
+    namespace["metrics"].latency = defaultdict(Samples)
+    return namespace
+
+
+def prepare_state(bot, config: dict) -> None:
+    import nextcord
+
+    state = bot._connection
+    state.user = nextcord.ClientUser(state=state, data=user_payload(BOT_ID, bot=True))
+    state.application_id = APPLICATION_ID
+    role_ids = {"@everyone": GUILD_ID, **config["roles"]}
+    roles = [
+        {
+            "id": str(role_id),
+            "name": name,
+            "permissions": "0",
+            "position": position,
+            "color": 0,
+            "hoist": False,
+            "managed": False,
+            "mentionable": False,
+        }
+        for position, (name, role_id) in enumerate(role_ids.items())
+    ]
+    channel_ids = {*config["channels"].values(), config["features"]["react-roles"]["channel"]}
+    channels = [
+        {
+            "id": str(channel_id),
+            "type": 0,
+            "name": f"channel-{position}",
+            "position": position,
+            "permission_overwrites": [],
+            "guild_id": str(GUILD_ID),
+        }
+        for position, channel_id in enumerate(channel_ids)
+    ]
+    state._add_guild_from_data(
+        {
+            "id": str(GUILD_ID),
+            "name": "Replay",
+            "owner_id": str(USER_BASE),
+            "roles": roles,
+            "channels": channels,
+            "members": [{**member_payload(BOT_ID), "user": user_payload(BOT_ID, bot=True)}],
+            "member_count": 1,
+            "emojis": [],
+            "stickers": [],
+            "features": [],
+            "large": False,
+        }
+    )
+    bot.add_all_application_commands()
+
+
+async def drain(current: asyncio.Task, everything: bool = False) -> None:
+    while True:
+        pending = [task for task in asyncio.all_tasks() if task is not current and not task.done()]
+        if not everything:
+            # Delayed role flushes and publish jobs are picked up by the final drain.
+            pending = [task for task in pending if task.get_name().startswith("nextcord:")]
+        if not pending:
+            return
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def replay(namespace: dict, backend: FakeDiscord, events, args) -> None:
+    bot = namespace["bot"]
+    parsers = bot._connection.parsers
+    current = asyncio.current_task()
+    kinds = Counter()
+    interval = 1 / args.rate if args.rate else 0
+    deadline = time.perf_counter() + args.duration if args.duration else None
+    samples = [(0, rss_bytes())]
+    start = time.perf_counter()
+    for count, event in enumerate(events, 1):
+        if count > args.events and deadline is None:
+            break
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+        kinds[event["t"]] += 1
+        parsers[event["t"]](event["d"])
+        if interval:
+            await asyncio.sleep(max(0.0, start + count * interval - time.perf_counter()))
+        elif count % 64 == 0:
+            await drain(current)
+        if count % args.sample_every == 0:
+            samples.append((count, rss_bytes()))
+    await drain(current, everything=True)
+    elapsed = time.perf_counter() - start
+    total = sum(kinds.values())
+    if samples[-1][0] != total:
+        samples.append((total, rss_bytes()))
+    report(namespace["metrics"], backend, kinds, total, elapsed, samples)
+
+
+def report(
+    metrics, backend: FakeDiscord, kinds: Counter, total: int, elapsed: float, samples: list
+) -> None:
+    print(f"{total} events in {elapsed:.2f}s, {total / elapsed:.0f} events/s")
+    print("  " + ", ".join(f"{kind} {count}" for kind, count in kinds.most_common()))
+    print()
+    print(f"{'handler':<28} {'calls':>7} {'p50':>8} {'p99':>8} {'errors':>7} {'REST/call':>10}")
+    rest_by_handler = Counter()
+    for (handler, _, _), count in backend.calls.items():
+        rest_by_handler[handler] += count
+    for name, histogram in sorted(metrics.latency.items(), key=lambda item: -item[1].count):
+        print(
+            f"{name:<28} {histogram.count:>7} {histogram.quantile(0.5) * 1e3:>6.2f}ms "
+            f"{histogram.quantile(0.99) * 1e3:>6.2f}ms {metrics.errors.get(name, 0):>7} "
+            f"{rest_by_handler[name] / histogram.count:>10.3f}"
+        )
+    print()
+    print("REST calls")
+    for (handler, method, path), count in backend.calls.most_common():
+        print(f"{count:>8} {method} {path} ({handler})")
+    print(f"REST calls per event: {sum(backend.calls.values()) / max(total, 1):.3f}")
+    print()
+    first, last = samples[0][1], samples[-1][1]
+    print(
+        f"RSS {first / 2**20:.1f} MiB -> {last / 2**20:.1f} MiB "
+        f"({(last - first) / 2**20:+.1f} MiB)"
+    )
+    if len(samples) > 2:
+        midpoint = samples[len(samples) // 2]
+        # Growth over the second half of a soak run is what points at a leak.
+        print(
+            f"  second half: {(last - midpoint[1]) / 2**20:+.1f} MiB over "
+            f"{samples[-1][0] - midpoint[0]} events"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--record", type=Path, help="replay a recorded JSONL gateway stream")
+    parser.add_argument("--events", type=int, default=10000, help="number of synthetic events")
+    parser.add_argument("--duration", type=float, default=0, help="soak for this many seconds")
+    parser.add_argument("--rate", type=float, default=0, help="events per second, 0 = unthrottled")
+    parser.add_argument("--users", type=int, default=2000, help="distinct synthetic authors")
+    parser.add_argument("--rest-latency", type=float, default=0.0, help="simulated REST latency")
+    parser.add_argument("--no-rate-limits", action="store_true", help="drop features.rate-limits")
+    parser.add_argument("--sample-every", type=int, default=1000, help="RSS sample interval")
+    parser.add_argument("--tracemalloc", action="store_true", help="show top allocation growth")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import yaml
+
+    config = yaml.safe_load((ROOT / "config" / "config.yaml").read_text(encoding="utf-8"))
+    tags = yaml.safe_load((ROOT / "config" / "tags.yaml").read_text(encoding="utf-8"))
+    backend = FakeDiscord(latency=args.rest_latency)
+    with tempfile.TemporaryDirectory() as workdir:
+        namespace = load_bot(Path(workdir), backend, rate_limits=not args.no_rate_limits)
+        prepare_state(namespace["bot"], config)
+        if args.record:
+            events = load_recording(args.record)
+            args.events = float("inf")
+        else:
+            events = iter(Stream(config, tags, args.users, args.seed))
+        if args.tracemalloc:
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+        asyncio.run(replay(namespace, backend, events, args))
+        if args.tracemalloc:
+            print()
+            for stat in tracemalloc.take_snapshot().compare_to(before, "lineno")[:15]:
+                print(stat)
+        namespace["announcement_store"].close()
+        namespace["publish_queue"].close()
+        # Leave the scratch directory so it can be removed; the bot's config paths are relative.
+        os.chdir(tempfile.gettempdir())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "bot"))
+
+import yaml  # noqa: E402
+
+from utils.config import ConfigFile  # noqa: E402
+
+FILES = ("config.yaml", "language.yaml", "tags.yaml")
+
+# Same entry point as `poetry run python bot` in autorestart.sh, minus bot.run().
+STARTUP = "import runpy, sys; sys.path.insert(0, 'bot'); runpy.run_path('bot', run_name='startup')"
+
+
+def bench_loaders(number: int = 200) -> None:
+    for name in FILES:
+        raw = (ROOT / "config" / name).read_bytes()
+        timings = {
+            "pure": timeit.timeit(lambda: yaml.load(raw, Loader=yaml.SafeLoader), number=number),
+        }
+        if yaml.__with_libyaml__:
+            timings["libyaml"] = timeit.timeit(
+                lambda: yaml.load(raw, Loader=yaml.CSafeLoader), number=number
+            )
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / name
+            shutil.copy(ROOT / "config" / name, path)
+            ConfigFile(path)
+            timings["snapshot"] = timeit.timeit(lambda: ConfigFile(path), number=number)
+        print(
+            f"{name}: "
+            + ", ".join(f"{key} {value / number * 1e3:.3f} ms" for key, value in timings.items())
+        )
+
+
+def run_startup(workdir: Path) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", STARTUP],
+        cwd=workdir,
+        env={**os.environ, "BOT_TOKEN": "benchmark"},
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def bench_startup(runs: int = 5) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        shutil.copytree(ROOT / "bot", workdir / "bot")
+        shutil.copytree(ROOT / "config", workdir / "config", ignore=shutil.ignore_patterns(".cache"))
+        cold = []
+        for _ in range(runs):
+            shutil.rmtree(workdir / "config" / ".cache", ignore_errors=True)
+            cold.append(run_startup(workdir))
+        warm = [run_startup(workdir) for _ in range(runs)]
+    print(
+        f"startup: cold {statistics.median(cold) * 1e3:.0f} ms, "
+        f"warm snapshot {statistics.median(warm) * 1e3:.0f} ms (median of {runs})"
+    )
+
+
+if __name__ == "__main__":
+    bench_loaders()
+    bench_startup()
@@ -1,87 +1,159 @@
-import random
+import asyncio
+import io
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+import aiohttp
 import nextcord
 from nextcord.ext import commands
 from nextcord.ext import tasks
-from utils.config import KEY
-from utils.discord import cmddef, argdef, gcmddef, require_role, can_dm_user
+from utils.config import KEY, touches
+from utils.role_queue import RoleQueue
+from utils.attachments import AttachmentDownloader, AttachmentBudgetExceeded
+from utils.presence import PresenceScheduler
+from utils.general import TTLCache
+from utils.announcements import AnnouncementStore, PublishJob, PublishQueue
+from utils.command_sync import CommandSync
+from utils.dispatch import PrefixDispatcher
+from utils.gateway import GatewayReport, load_profile
+from utils.metrics import Metrics
+from utils.profiler import LoopProfiler, ProfilerBusy
+from utils.publishing import Publisher
+from utils.discord import (
+    cmddef,
+    argdef,
+    gcmddef,
+    require_permission,
+    rate_limit,
+    can_dm_user,
+)
 from conf import (
     BOT_TOKEN,
     config,
     lang,
-    tags,
+    tag_cache,
+    tag_index,
     format_string,
     reload_config,
+    reload_changed_config,
     config_file,
     lang_file,
     tags_file,
+    settings,
+    permissions,
+    rate_limiter,
 )
 
-intents = nextcord.Intents.default()
-intents.presences = True
-intents.message_content = True
-intents.members = True
-bot = commands.Bot(intents=intents)
+gateway_profile = load_profile(config)
+bot = commands.Bot(
+    **gateway_profile.client_options(),
+    enable_debug_events=config.gobj(KEY.features.metrics.enabled(), True),
+)
+metrics = Metrics()
+profiler = LoopProfiler(top=config.gint(KEY.features.profiler.top(), 30))
+metrics.instrument_http(bot.http)
+metrics.instrument_commands(bot)
+role_queue = RoleQueue(
+    bot.http,
+    window=config.gobj(KEY.features.role_queue.window(), 1.0),
+    concurrency=config.gint(KEY.features.role_queue.concurrency(), 4),
+)
+presence_scheduler = PresenceScheduler(settings)
+command_sync = CommandSync(
+    bot,
+    config.gstr(KEY.features.command_sync.state(), "data/command-sync.json"),
+    verify_after=config.gint(KEY.features.command_sync.verify_after(), 86400),
+)
+permissions.rule("announcement", lambda s: {
+    name: target.allowed_role_ids for name, target in s.announce.items()
+})
+permissions.rule("mssbot-reload", lambda s: {s.admin_role_id})
+permissions.rule("mssbot-stop", lambda s: {s.admin_role_id})
+permissions.rule("mssbot-stats", lambda s: {s.admin_role_id})
+permissions.rule("mssbot-profile", lambda s: {s.admin_role_id})
+permissions.rule("trust", lambda s: {s.admin_role_id})
+permissions.rule("untrust", lambda s: {s.admin_role_id})
+announcement_store = AnnouncementStore(
+    config.gstr(KEY.features.announcements.database(), "data/announcements.sqlite3")
+)
+publish_queue = PublishQueue(
+    config.gstr(KEY.features.announcements.database(), "data/announcements.sqlite3")
+)
+text_commands = PrefixDispatcher()
+recent_tags = TTLCache(
+    config.gint(KEY.features.tag_dedup.maxsize(), 256),
+    ttl=config.gobj(KEY.features.tag_dedup.window(), 300),
+)
+attachment_downloader = AttachmentDownloader(
+    max_total_bytes=config.gint(
+        KEY.features.attachments.max_total_bytes(), 25 * 1024 * 1024
+    ),
+)
 
 
-@tasks.loop(seconds=30)
+@tasks.loop(seconds=5)
 async def update_presence():
-    random_presence = random.choice(config.glist(KEY.profile.activities()))
-    if random_presence["type"] == "playing":
-        await bot.change_presence(
-            activity=nextcord.Game(
-                name=random_presence.get(
-                    "name", "mit jemandem, der die Konfiguration zerschossen hat"
-                )
-            )
-        )
-    elif random_presence["type"] == "listening":
-        await bot.change_presence(
-            activity=nextcord.Activity(
-                type=nextcord.ActivityType.listening,
-                name=random_presence.get(
-                    "name", "wie jemand die Konfiguration zerschossen hat"
-                ),
-            )
-        )
-    elif random_presence["type"] == "watching":
-        await bot.change_presence(
-            activity=nextcord.Activity(
-                type=nextcord.ActivityType.watching,
-                name=random_presence.get(
-                    "name", "jemandem, der die Konfiguration zerschossen hat"
-                ),
-            )
-        )
-    elif random_presence["type"] == "streaming":
-        await bot.change_presence(
-            activity=nextcord.Streaming(
-                name=random_presence.get(
-                    "name", "wie jemand die Konfiguration zerschossen hat"
-                ),
-                url=random_presence.get("url", "https://twitch.tv/JoJoJux16"),
-            )
-        )
-    else:
-        await bot.change_presence(
-            activity=nextcord.Activity(
-                type=nextcord.ActivityType.watching,
-                name="den Typen an, der die Konfiguration zerschossen hat",
-            )
+    await presence_scheduler.tick(bot)
+
+
+@bot.event
+async def on_connect():
+    bot.add_all_application_commands()
+    if not config.gobj(KEY.features.command_sync.enabled(), True):
+        await bot.sync_application_commands()
+        return
+    print(f"Global commands: {await command_sync.sync()}")
+
+
+@bot.event
+async def on_guild_available(guild: nextcord.Guild):
+    try:
+        if config.gobj(KEY.features.command_sync.enabled(), True):
+            print(f"Commands for {guild.name}: {await command_sync.sync(guild.id)}")
+        else:
+            await bot.sync_application_commands(guild_id=guild.id)
+    except nextcord.Forbidden as e:
+        print(
+            f"Cannot sync commands for {guild.name}, is the applications.commands scope enabled?",
+            e,
         )
-    random_name = random.choice(config.glist(KEY.profile.names()))
-    await bot.user.edit(username=random_name)
-    random_nick = random.choice(config.glist(KEY.profile.nicks()))
-    await bot.get_guild(config.gint(KEY.guild())).me.edit(nick=random_nick)
 
 
 @bot.event
 async def on_ready():
     print(lang.gstr(KEY.messages.system.bot_ready()).format(bot.user))
     update_presence.start()
+    if not publish_due.is_running():
+        await publish_queue.requeue_running()
+        publish_due.start()
+    if config.gobj(KEY.features.hot_reload.enabled(), True) and not watch_config.is_running():
+        watch_config.start()
+    if not gateway_report.is_running():
+        gateway_report.start()
+    if config.gobj(KEY.features.metrics.enabled(), True):
+        try:
+            await metrics.serve(
+                config.gstr(KEY.features.metrics.host(), "127.0.0.1"),
+                config.gint(KEY.features.metrics.port(), 9108),
+            )
+        except OSError as e:
+            print("Could not start the metrics endpoint:", e)
+
+
+@tasks.loop(count=1)
+async def gateway_report():
+    await asyncio.sleep(config.gint(KEY.features.gateway.report_delay(), 60))
+    report = GatewayReport(
+        config.gstr(KEY.features.gateway.report(), "data/gateway-profiles.json")
+    )
+    print(report.record(gateway_profile, bot, metrics.gateway_bytes, sum(metrics.gateway_events.values())))
 
 
 def get_parent_cmd(name, on=bot):
-    @on.slash_command(guild_ids=[config.gint(KEY.guild())], name=name)
+    @on.slash_command(guild_ids=[settings.guild_id], name=name)
     async def announcement(interaction: nextcord.Interaction):
         await interaction.send("That is impossible.", ephemeral=True)
 
@@ -101,7 +173,7 @@ async def announce(
         "channel",
         lang.gstr(KEY.commands.announce.arguments.channel()),
         required=True,
-        choices=config.gobj(KEY.commands.announce()).keys(),
+        choices=settings.announce.keys(),
     ),
     message: str = nextcord.SlashOption(
         "message", lang.gstr(KEY.commands.announce.arguments.message()), required=True
@@ -140,39 +212,96 @@ async def announce(
         lang.gstr(KEY.commands.announce.arguments.attachment()),
         required=False,
     ),
+    also: str = nextcord.SlashOption(
+        "also",
+        lang.gstr(KEY.commands.announcement_create.arguments.also()),
+        required=False,
+    ),
+    send_at: str = nextcord.SlashOption(
+        "send-at",
+        lang.gstr(KEY.commands.announcement_create.arguments.send_at()),
+        required=False,
+    ),
 ):
-    # Only allow if has role Admin or Updater
-    if not any(
-        role.id
-        in (
-            config.gint(KEY.roles.admin()),
-            *(
-                config.gobj(KEY.roles())[roleid]
-                for roleid in config.glist(
-                    KEY.commands.announce[channel].allowed_senders()
-                )
-            ),
-        )
-        for role in interaction.user.roles
-    ):
+    target = settings.announce[channel]
+    # Only allow if has role Admin or one of the allowed senders
+    if not permissions.check(f"announcement.{target.name}", interaction.user):
         return await interaction.response.send_message(
             lang.gstr(KEY.messages.no_permission.to_run_command()), ephemeral=True
         )
-    dc_channel = bot.get_channel(
-        config.gint(
-            KEY.channels[config.gobj(KEY.commands.announce())[channel].channel]()
+    targets = [target]
+    for name in (also or "").split(","):
+        name = name.strip()
+        if not name or any(existing.name == name for existing in targets):
+            continue
+        if name not in settings.announce:
+            return await interaction.response.send_message(
+                lang.gstr(KEY.messages.announcements.unknown_target()).format(name),
+                ephemeral=True,
+            )
+        if not permissions.check(f"announcement.{name}", interaction.user):
+            return await interaction.response.send_message(
+                lang.gstr(KEY.messages.no_permission.to_run_command()), ephemeral=True
+            )
+        targets.append(settings.announce[name])
+    scheduled_at = interaction.created_at
+    if send_at:
+        try:
+            scheduled_at = datetime.strptime(send_at, "%d.%m.%Y %H:%M").replace(
+                tzinfo=ZoneInfo(config.gstr(KEY.features.publishing.timezone(), "Europe/Berlin"))
+            )
+        except ValueError:
+            return await interaction.response.send_message(
+                lang.gstr(KEY.messages.announcements.invalid_time()).format(send_at),
+                ephemeral=True,
+            )
+    attachments = [
+        attachment
+        for attachment in [attachment1, attachment2, attachment3, attachment4]
+        if attachment
+    ]
+    embedded = [attachment for attachment in [image, thumbnail] if attachment]
+    try:
+        attachment_downloader.check_budget(attachments + embedded)
+    except AttachmentBudgetExceeded as e:
+        return await interaction.response.send_message(
+            lang.gstr(KEY.messages.announcements.too_large()).format(
+                e.size // 1024, e.budget // 1024
+            ),
+            ephemeral=True,
         )
+    await interaction.response.defer(ephemeral=True)
+
+    spool = Path(config.gstr(KEY.features.publishing.spool(), "data/publish-spool")) / str(
+        interaction.id
     )
+    try:
+        paths = await attachment_downloader.save(attachments + embedded, spool)
+    except (AttachmentBudgetExceeded, nextcord.HTTPException, aiohttp.ClientError) as e:
+        return await interaction.send(
+            lang.gstr(KEY.messages.announcements.download_failed()).format(e), ephemeral=True
+        )
+    saved = [
+        {
+            "path": str(path),
+            "filename": attachment.filename,
+            "size": attachment.size,
+            "description": attachment.description,
+            "spoiler": attachment.is_spoiler(),
+        }
+        for attachment, path in zip(attachments + embedded, paths)
+    ]
+    saved_image = saved_thumbnail = None
+    if image:
+        saved_image = {**saved[len(attachments)], "filename": f"image{Path(image.filename).suffix}"}
+    if thumbnail:
+        saved_thumbnail = {**saved[-1], "filename": f"thumbnail{Path(thumbnail.filename).suffix}"}
 
     embed = nextcord.Embed()
     embed.title = title
     embed.description = format_string(
         message, sender=interaction.user.mention if interaction.user else None
     )
-    if image:
-        embed.set_image(url=image.url)
-    if thumbnail:
-        embed.set_thumbnail(url=thumbnail.url)
     # embed.set_author(
     #     name=interaction.user, icon_url=interaction.user.display_avatar.url
     # )
@@ -186,27 +315,114 @@ async def announce(
     embed.colour = nextcord.Colour.blurple()
     embed.timestamp = interaction.created_at
 
-    await dc_channel.send(
-        content=f"<@&{config['roles'][config['commands.announce'][channel]['ping-role']]}>",
+    job_id = await publish_queue.enqueue(
+        [target.name for target in targets],
+        {
+            "embed": embed.to_dict(),
+            "title": title,
+            "source": message,
+            "author_id": interaction.user.id,
+            "author_name": str(interaction.user),
+            "created_at": interaction.created_at.isoformat(),
+            "spool": str(spool),
+            "image": saved_image,
+            "thumbnail": saved_thumbnail,
+            "attachments": saved[: len(attachments)],
+        },
+        scheduled_at,
+    )
+    # The preview can still use Discord's URLs, they are valid for now.
+    if image:
+        embed.set_image(url=image.url)
+    if thumbnail:
+        embed.set_thumbnail(url=thumbnail.url)
+    await interaction.send(
+        lang.gstr(KEY.messages.announcements.queued()).format(
+            job_id,
+            ", ".join(target.name for target in targets),
+            f"<t:{int(scheduled_at.timestamp())}:f>",
+            len(attachments),
+        ),
+        ephemeral=True,
         embed=embed,
-        files=[
-            await attachment.to_file()
-            for attachment in [attachment1, attachment2, attachment3, attachment4]
-            if attachment
-        ],
     )
+    if scheduled_at <= datetime.now(timezone.utc):
+        await publisher.run_due()
+
+
+async def publish_announcement(job: PublishJob) -> int:
+    target = settings.announce[job.target]
+    payload = job.payload
+    embed = nextcord.Embed.from_dict(payload["embed"])
+    files = [attachment.to_file() for attachment in job.attachments]
+    # Embedded images are uploaded with the message, so they never point at an expired URL.
+    image_url = thumbnail_url = None
+    if job.image:
+        files.append(job.image.to_file())
+        image_url = f"attachment://{job.image.filename}"
+        embed.set_image(url=image_url)
+    if job.thumbnail:
+        files.append(job.thumbnail.to_file())
+        thumbnail_url = f"attachment://{job.thumbnail.filename}"
+        embed.set_thumbnail(url=thumbnail_url)
+    embedded = {attachment.filename for attachment in (job.image, job.thumbnail) if attachment}
+    announcement = await bot.get_partial_messageable(target.channel_id).send(
+        content=f"<@&{target.ping_role_id}>",
+        embed=embed,
+        files=files,
+    )
+    await announcement_store.record(
+        message_id=announcement.id,
+        channel_id=target.channel_id,
+        target=target.name,
+        title=payload["title"],
+        source=payload["source"],
+        author_id=payload["author_id"],
+        author_name=payload["author_name"],
+        created_at=datetime.fromisoformat(payload["created_at"]),
+        image_url=image_url,
+        thumbnail_url=thumbnail_url,
+        attachments=tuple(
+            {"filename": attachment.filename, "url": attachment.url, "size": attachment.size}
+            for attachment in announcement.attachments
+            if attachment.filename not in embedded
+        ),
+    )
+    return announcement.id
 
-    attachemnts_count = sum(
-        bool(attachment)
-        for attachment in [attachment1, attachment2, attachment3, attachment4]
+
+async def announcement_settled(job: PublishJob, batch: dict) -> None:
+    shutil.rmtree(job.payload["spool"], ignore_errors=True)
+    failed = {target: entry["error"] for target, entry in batch.items() if entry["status"] == "failed"}
+    if not failed:
+        return
+    author = bot.get_user(job.payload["author_id"]) or await bot.fetch_user(
+        job.payload["author_id"]
     )
-    await interaction.response.send_message(
-        lang.gstr(KEY.messages.announcements.published()).format(attachemnts_count),
-        ephemeral=True,
-        embed=embed,
+    await author.send(
+        lang.gstr(KEY.messages.announcements.failed()).format(
+            job.batch_id,
+            "\n".join(f"{target}: {error}" for target, error in failed.items()),
+        )
     )
 
 
+publisher = Publisher(
+    publish_queue,
+    publish_announcement,
+    channel_of=lambda job: getattr(settings.announce.get(job.target), "channel_id", job.target),
+    per_channel=config.gint(KEY.features.publishing.per_channel(), 1),
+    max_attempts=config.gint(KEY.features.publishing.max_attempts(), 5),
+    retry_delay=config.gobj(KEY.features.publishing.retry_delay(), 5.0),
+    settled=announcement_settled,
+)
+
+
+@tasks.loop(seconds=config.gobj(KEY.features.publishing.interval(), 5))
+async def publish_due():
+    await publisher.run_due()
+
+
 @slash_group_announcement.subcommand(
     **cmddef("announcement", "edit"),
 )
@@ -216,6 +432,7 @@ async def editannounce(
         "msglink",
         lang.gstr(KEY.commands.editannounce.arguments.msglink()),
         required=True,
+        autocomplete=True,
     ),
     message: str = nextcord.SlashOption(
         "message",
@@ -228,117 +445,181 @@ async def editannounce(
         required=False,
     ),
 ):
-
     data = msglink.split("/")
-    msgid = int(data[-1])
-    channelid = int(data[-2])
-    try:
-        channel = await bot.fetch_channel(channelid)
-        initial_message = await channel.fetch_message(msgid)
-    except nextcord.errors.ApplicationInvokeError as e:
+    record = None
+    if data[-1].isdigit():
+        record = await announcement_store.get(int(data[-1]))
+    if record is not None:
+        msgid, channelid = record.message_id, record.channel_id
+        target = settings.announce.get(record.target)
+    elif len(data) > 1 and data[-1].isdigit() and data[-2].isdigit():
+        msgid, channelid = int(data[-1]), int(data[-2])
+        target = settings.announce_by_channel.get(channelid)
+    else:
         return await interaction.response.send_message(
-            lang.gstr(KEY.messages.announcements.error()).format(e), ephemeral=True
+            lang.gstr(KEY.messages.announcements.not_found()).format(msglink), ephemeral=True
         )
 
-    # Only allow if has role Admin or Updater
-    channel = next(
-        key
-        for key, value in config.gobj(KEY.commands.announce()).items()
-        if config.gobj(KEY.channels()).get(value["channel"]) == channelid
-    )
-    if not any(
-        role.id
-        in (
-            config.gint(KEY.roles.admin()),
-            *(
-                config.gobj(KEY.roles())[roleid]
-                for roleid in config.gobj(KEY.commands.announce())[channel][
-                    "allowed-senders"
-                ]
-            ),
-        )
-        for role in interaction.user.roles
+    # Only allow if has role Admin or one of the allowed senders
+    if target is None or not permissions.check(
+        f"announcement.{target.name}", interaction.user
     ):
         return await interaction.response.send_message(
             lang.gstr(KEY.messages.no_permission.to_run_command()), ephemeral=True
         )
 
-    embed = initial_message.embeds[0]
-    if title:
-        embed.title = title
-    if message:
-        embed.description = format_string(message, sender=interaction.user.mention)
-    embed.set_footer(
-        text=lang["messages.announcements.author_edited"].format(
-            interaction.user, interaction.created_at
-        ),
-        icon_url=interaction.user.display_avatar.url,
+    footer = lang["messages.announcements.author_edited"].format(
+        interaction.user, interaction.created_at
     )
-    embed.colour = nextcord.Colour.blurple()
 
-    await initial_message.edit(
-        content=f"<@&{config['roles'][config['commands.announce'][channel]['ping-role']]}>",
-        embed=embed,
-        files=initial_message.attachments,
+    if record is not None:
+        embed = nextcord.Embed()
+        embed.title = title or record.title
+        embed.description = (
+            format_string(message, sender=interaction.user.mention)
+            if message
+            else format_string(record.source, sender=f"<@{record.author_id}>")
+        )
+        if record.image_url:
+            embed.set_image(url=record.image_url)
+        if record.thumbnail_url:
+            embed.set_thumbnail(url=record.thumbnail_url)
+        embed.set_footer(text=footer, icon_url=interaction.user.display_avatar.url)
+        embed.colour = nextcord.Colour.blurple()
+        embed.timestamp = record.created_at
+
+        await (
+            bot.get_partial_messageable(channelid)
+            .get_partial_message(msgid)
+            .edit(content=f"<@&{target.ping_role_id}>", embed=embed)
+        )
+        attachments_count = len(record.attachments)
+    else:
+        try:
+            channel = bot.get_channel(channelid) or await bot.fetch_channel(channelid)
+            initial_message = await channel.fetch_message(msgid)
+        except nextcord.HTTPException as e:
+            return await interaction.response.send_message(
+                lang.gstr(KEY.messages.announcements.error()).format(e), ephemeral=True
+            )
+
+        embed = initial_message.embeds[0]
+        if title:
+            embed.title = title
+        if message:
+            embed.description = format_string(message, sender=interaction.user.mention)
+        embed.set_footer(text=footer, icon_url=interaction.user.display_avatar.url)
+        embed.colour = nextcord.Colour.blurple()
+
+        await initial_message.edit(
+            content=f"<@&{target.ping_role_id}>",
+            embed=embed,
+            attachments=initial_message.attachments,
+        )
+        attachments_count = len(initial_message.attachments)
+
+    await announcement_store.update(
+        msgid,
+        editor_id=interaction.user.id,
+        edited_at=interaction.created_at,
+        title=title,
+        source=message,
     )
 
     await interaction.response.send_message(
-        lang.gstr(KEY.messages.announcements.edited()).format(
-            len(initial_message.attachments)
-        ),
+        lang.gstr(KEY.messages.announcements.edited()).format(attachments_count),
         ephemeral=True,
         embed=embed,
     )
 
 
+@editannounce.on_autocomplete("msglink")
+async def get_announcement_autocomplete(interaction: nextcord.Interaction, input_: str):
+    return {
+        f"{record.title or record.target} ({record.target}, {record.created_at:%d.%m.%Y %H:%M})"[
+            :100
+        ]: str(record.message_id)
+        for record in await announcement_store.recent(input_ or "")
+    }
+
+
 async def reload_config_backend():
     with config_file.try_to_change(), lang_file.try_to_change(), tags_file.try_to_change():
-        reload_config()
+        await reload_config()
+        presence_scheduler.configure()
 
         if not update_presence.is_running():
             update_presence.start()
-            
-        rmessage: nextcord.Message
-
-        if config.gint(KEY.features.react_roles.message(), None) is None:
-            rmessage: nextcord.Message = await bot.get_channel(
-                config.gint(KEY.features.react_roles.channel())
-            ).send(
-                lang.gstr(KEY.messages.react_roles.default_message())
-                + "\n"
-                + "\n".join(
-                    f"{entry['emoji']}: {entry['description']} (<@&{entry['role']}>)"
-                    for entry in config.glist(KEY.features.react_roles.roles())
-                )
-            )
-            config.set(KEY.features.react_roles.message(), rmessage.id)
-            for entry in config.glist(KEY.features.react_roles.roles()):
-                await rmessage.add_reaction(entry["emoji"])
-        else:
-            rmessage: nextcord.Message = await bot.get_channel(
-                config.gint(KEY.features.react_roles.channel())
-            ).fetch_message(config.gint(KEY.features.react_roles.message()))
-            await rmessage.edit(
-                content=lang.gstr(KEY.messages.react_roles.default_message())
-                + "\n"
-                + "\n".join(
-                    f"{entry['emoji']}: {entry['description']} (<@&{entry['role']}>)"
-                    for entry in config.glist(KEY.features.react_roles.roles())
-                )
-            )
-            for reaction in rmessage.reactions:
-                if not any(
-                    entry["emoji"] == reaction.emoji
-                    for entry in config.glist(KEY.features.react_roles.roles())
-                ):
-                    await rmessage.clear_reaction(reaction.emoji)
-            for entry in config.glist(KEY.features.react_roles.roles()):
-                if not any(
-                    entry["emoji"] == reaction.emoji
-                    for reaction in rmessage.reactions
-                    if reaction.me
-                    ):
-                    await rmessage.add_reaction(entry["emoji"])
+
+        await sync_react_roles_message()
+
+
+async def sync_react_roles_message():
+    react_roles = settings.react_roles
+    content = (
+        lang.gstr(KEY.messages.react_roles.default_message())
+        + "\n"
+        + "\n".join(
+            f"{entry.emoji}: {entry.description} (<@&{entry.role_id}>)"
+            for entry in react_roles.roles
+        )
+    )
+
+    if react_roles.message_id is None:
+        rmessage: nextcord.Message = await bot.get_channel(react_roles.channel_id).send(
+            content
+        )
+        config.set(KEY.features.react_roles.message(), rmessage.id)
+        settings.recompile()
+        for entry in react_roles.roles:
+            await rmessage.add_reaction(entry.emoji)
+    else:
+        rmessage: nextcord.Message = await bot.get_channel(
+            react_roles.channel_id
+        ).fetch_message(react_roles.message_id)
+        await rmessage.edit(content=content)
+        for reaction in rmessage.reactions:
+            if reaction.emoji not in react_roles.roles_by_emoji:
+                await rmessage.clear_reaction(reaction.emoji)
+        for entry in react_roles.roles:
+            if not any(
+                entry.emoji == reaction.emoji
+                for reaction in rmessage.reactions
+                if reaction.me
+            ):
+                await rmessage.add_reaction(entry.emoji)
+
+
+@tasks.loop(seconds=config.gobj(KEY.features.hot_reload.interval(), 2))
+async def watch_config():
+    try:
+        changes = await reload_changed_config()
+    except Exception as e:
+        print("Could not reload changed config files:", e)
+        return
+    if not any(changes.values()):
+        return
+    print(
+        "Reloaded",
+        ", ".join(
+            f"{changed_file.path.name} ({len(changed)} changes)"
+            for changed_file, changed in changes.items()
+            if changed
+        ),
+    )
+    # Anything escaping the loop body would stop hot reload for good.
+    if touches(changes[config_file], KEY.profile()):
+        try:
+            presence_scheduler.configure()
+        except Exception as e:
+            print("Could not update the presence schedule:", e)
+    if touches(changes[config_file], KEY.features.react_roles()) or touches(
+        changes[lang_file], KEY.messages.react_roles()
+    ):
+        try:
+            await sync_react_roles_message()
+        except Exception as e:
+            print("Could not update the react roles message:", e)
 
 
 @slash_group_general.subcommand(
@@ -346,9 +627,7 @@ async def reload_config_backend():
 )
 async def reload_config_cmd(interaction: nextcord.Interaction):
     # Only allow if has role Admin
-    if not any(
-        role.id == config.gint(KEY.roles.admin()) for role in interaction.user.roles
-    ):
+    if not permissions.check("mssbot-reload", interaction.user):
         return await interaction.response.send_message(
             lang.gstr(KEY.messages.no_permission.to_run_command()), ephemeral=True
         )
@@ -367,12 +646,44 @@ async def reload_config_cmd(interaction: nextcord.Interaction):
 
 
 async def get_tag_autocomplete(interaction: nextcord.Interaction, input_: str):
-    return (tag for tag in tags.data.keys() if tag.startswith(input_))
+    return tag_index.complete(
+        input_ or "",
+        case_insensitive=config.gobj(
+            KEY.features.tag_autocomplete.case_insensitive(), True
+        ),
+        fuzzy=config.gobj(KEY.features.tag_autocomplete.fuzzy(), False),
+    )
+
+
+async def recent_tag_link(channel_id: int, name: str) -> Optional[str]:
+    if not config.gobj(KEY.features.tag_dedup.enabled(), False):
+        return None
+    earlier = recent_tags.get((channel_id, name))
+    if earlier is None or isinstance(earlier, str):
+        return earlier
+    # Interaction responses only learn their message ID once fetched; keep the
+    # link so further repeats within the window don't fetch it again.
+    try:
+        link = (await earlier.fetch()).jump_url
+    except nextcord.HTTPException:
+        recent_tags.pop((channel_id, name))
+        return None
+    if recent_tags.get((channel_id, name)) is earlier:
+        recent_tags.replace((channel_id, name), link)
+    return link
+
+
+def remember_tag(channel_id: int, name: str, sent) -> None:
+    if config.gobj(KEY.features.tag_dedup.enabled(), False):
+        recent_tags.put(
+            (channel_id, name), sent, ttl=config.gobj(KEY.features.tag_dedup.window(), 300)
+        )
 
 
 @bot.slash_command(
     **gcmddef("tag"),
 )
+@rate_limit("tag")
 async def tag(
     interaction: nextcord.Interaction,
     tag_: str = nextcord.SlashOption(
@@ -382,49 +693,37 @@ async def tag(
         autocomplete_callback=get_tag_autocomplete,
     ),
 ):
-    tag_content = tags.gstr(tag_)
+    cached_tag = tag_cache.get(tag_)
 
-    if tag_content is None:
+    if cached_tag is None:
         return await interaction.response.send_message(
             lang.gstr(KEY.messages.tag.not_found()).format(tag_), ephemeral=True
         )
 
-    if isinstance(tag_content, dict):
-        embed = nextcord.Embed()
-        embed.title = tag_content.get("title")
-        embed.description = (
-            format_string(t) if (t := tag_content.get("content")) is not None else None
-        )
-        embed.set_footer(
-            text=lang.gstr(KEY.messages.tag.author()).format(interaction.user),
-            icon_url=interaction.user.display_avatar.url,
-        )
-        embed.timestamp = interaction.created_at
-        embed.colour = nextcord.Colour.blurple()
-        embed.set_image(url=tag_content.get("image"))
-        embed.set_thumbnail(url=tag_content.get("thumbnail"))
-        if "author" in tag_content:
-            embed.set_author(
-                name=tag_content.get("author"), icon_url=tag_content.get("author-icon")
-            )
-
+    earlier = await recent_tag_link(interaction.channel_id, tag_)
+    if earlier is not None:
         return await interaction.response.send_message(
-            (
-                format_string(t)
-                if (t := tag_content.get("message")) is not None
-                else None
-            ),
-            embed=embed,
+            lang.gstr(KEY.messages.tag.recently_posted()).format(tag_, earlier), ephemeral=True
         )
 
-    tag_content = format_string(tag_content, sender=interaction.user.mention)
-
-    await interaction.response.send_message(tag_content)
+    if cached_tag.is_embed:
+        embed = cached_tag.render_embed(
+            lang.gstr(KEY.messages.tag.author()).format(interaction.user),
+            interaction.user.display_avatar.url,
+            interaction.created_at,
+        )
+        sent = await interaction.response.send_message(cached_tag.message, embed=embed)
+    else:
+        sent = await interaction.response.send_message(
+            cached_tag.render(sender=interaction.user.mention)
+        )
+    remember_tag(interaction.channel_id, tag_, sent)
 
 
 @slash_group_general.subcommand(
     **cmddef("mssbot", "formatmsg"),
 )
+@rate_limit("mssbot-formatmsg")
 async def form(
     interaction: nextcord.Interaction,
     text: str = nextcord.SlashOption(
@@ -440,7 +739,7 @@ async def form(
 @bot.slash_command(
     **gcmddef("trust"),
 )
-@require_role(config.gint(KEY.roles.admin()))
+@require_permission("trust")
 async def trust(
     interaction: nextcord.Interaction,
     member: nextcord.Member = nextcord.SlashOption(
@@ -449,22 +748,25 @@ async def trust(
         required=True,
     ),
 ):
-    trusted_role = member.guild.get_role(config.gint(KEY.roles.trusted()))
+    trusted_role = member.guild.get_role(settings.trusted_role_id)
     if trusted_role in member.roles:
         return await interaction.response.send_message(
             lang.gstr(KEY.messages.trust.already_trusted()).format(member.mention),
             ephemeral=True,
         )
-    await member.add_roles(trusted_role)
-    await interaction.response.send_message(
-        lang.gstr(KEY.messages.trust.success()).format(member.mention)
-    )
+    await interaction.response.defer()
+    error = await role_queue.add(member.guild, member.id, trusted_role.id)
+    if error is not None:
+        return await interaction.send(
+            lang.gstr(KEY.messages.role_change_failed()).format(member.mention, error)
+        )
+    await interaction.send(lang.gstr(KEY.messages.trust.success()).format(member.mention))
 
 
 @bot.slash_command(
     **gcmddef("untrust"),
 )
-@require_role(config.gint(KEY.roles.admin()))
+@require_permission("untrust")
 async def untrust(
     interaction: nextcord.Interaction,
     member: nextcord.Member = nextcord.SlashOption(
@@ -473,58 +775,141 @@ async def untrust(
         required=True,
     ),
 ):
-    trusted_role = member.guild.get_role(config.gint(KEY.roles.trusted()))
+    trusted_role = member.guild.get_role(settings.trusted_role_id)
     if trusted_role not in member.roles:
         return await interaction.response.send_message(
             lang.gstr(KEY.messages.untrust.not_trusted()).format(member.mention),
             ephemeral=True,
         )
-    await member.remove_roles(trusted_role)
-    await interaction.response.send_message(
-        lang.gstr(KEY.messages.untrust.success()).format(member.mention)
-    )
+    await interaction.response.defer()
+    error = await role_queue.remove(member.guild, member.id, trusted_role.id)
+    if error is not None:
+        return await interaction.send(
+            lang.gstr(KEY.messages.role_change_failed()).format(member.mention, error)
+        )
+    await interaction.send(lang.gstr(KEY.messages.untrust.success()).format(member.mention))
 
 
 @slash_group_general.subcommand(
     **cmddef("mssbot", "stop"),
 )
-@require_role(config.gint(KEY.roles.admin()))
+@require_permission("mssbot-stop")
 async def stop(
     interaction: nextcord.Interaction,
 ):
     await interaction.response.send_message(
         lang.gstr(KEY.messages.system.bot_stop_response()), ephemeral=True
     )
+    publish_due.cancel()
+    gateway_report.cancel()
+    await publisher.drain()
+    await metrics.close()
+    await attachment_downloader.close()
+    announcement_store.close()
+    publish_queue.close()
     await bot.close()
 
 
+@text_commands.command("!f ")
+@rate_limit("ex-f")
+async def ex_f(message: nextcord.Message, text: str):
+    await message.reply(
+        format_string(
+            lang.gstr(KEY.messages.ex_f.used()).format(text),
+            sender=message.author.mention,
+        )
+    )
+
+
+@text_commands.command("!!")
+@rate_limit("ex-tag")
+async def ex_tag(message: nextcord.Message, name: str):
+    cached_tag = tag_cache.get(name)
+    if cached_tag is None:
+        await message.reply(lang.gstr(KEY.messages.tag.not_found()).format(name))
+        return
+    if cached_tag.is_embed:
+        await message.reply(lang.gstr(KEY.messages.tag.use_slash_command()).format(name))
+        return
+    earlier = await recent_tag_link(message.channel.id, name)
+    if earlier is not None:
+        await message.reply(lang.gstr(KEY.messages.tag.recently_posted()).format(name, earlier))
+        return
+    sent = await message.reply(cached_tag.render(sender=message.author.mention))
+    remember_tag(message.channel.id, name, sent.jump_url)
+
+
+@slash_group_general.subcommand(
+    **cmddef("mssbot", "stats"),
+)
+@require_permission("mssbot-stats")
+async def stats(
+    interaction: nextcord.Interaction,
+):
+    components = {
+        "role-queue": role_queue.stats(),
+        "presence": presence_scheduler.stats(),
+        "publisher": publisher.stats(),
+        "permissions": permissions.stats(),
+        "tag-cache": tag_cache.stats(),
+        "rate-limiter": rate_limiter.stats(),
+    }
+    report = metrics.exposition() + "\n" + "\n".join(
+        f"# {name}: {values}" for name, values in components.items()
+    )
+    await interaction.response.send_message(
+        f"```\n{metrics.summary()[:1900]}\n```",
+        ephemeral=True,
+        file=nextcord.File(io.BytesIO(report.encode()), filename="metrics.txt"),
+    )
+
+
+@slash_group_general.subcommand(
+    **cmddef("mssbot", "profile"),
+)
+@require_permission("mssbot-profile")
+async def profile(
+    interaction: nextcord.Interaction,
+    seconds: int = nextcord.SlashOption(
+        "seconds",
+        lang.gstr(KEY.commands.mssbot_profile.arguments.seconds()),
+        required=False,
+        default=10,
+        min_value=1,
+        max_value=300,
+    ),
+):
+    seconds = min(seconds, config.gint(KEY.features.profiler.max_seconds(), 60))
+    if profiler.busy:
+        return await interaction.response.send_message(
+            lang.gstr(KEY.messages.profile.busy()), ephemeral=True
+        )
+    await interaction.response.send_message(
+        lang.gstr(KEY.messages.profile.started()).format(seconds), ephemeral=True
+    )
+    try:
+        report, stats_dump = await profiler.run(
+            seconds, slow_callback=config.gobj(KEY.features.profiler.slow_callback(), 0.1)
+        )
+    except ProfilerBusy:
+        return await interaction.followup.send(
+            lang.gstr(KEY.messages.profile.busy()), ephemeral=True
+        )
+    await interaction.followup.send(
+        lang.gstr(KEY.messages.profile.finished()).format(seconds),
+        ephemeral=True,
+        files=[
+            nextcord.File(io.BytesIO(report.encode()), filename="profile.txt"),
+            nextcord.File(io.BytesIO(stats_dump), filename="profile.pstats"),
+        ],
+    )
+
+
 @bot.event
 async def on_message(message):
     if message.author == bot.user:
         return
-    if message.content.startswith("!f "):
-        await message.reply(
-            format_string(
-                lang.gstr(KEY.messages.ex_f.used()).format(message.content[3:]),
-                sender=message.author.mention,
-            )
-        )
-    if message.content.startswith("!!"):
-        if message.content[2:] not in tags:
-            await message.reply(
-                lang.gstr(KEY.messages.tag.not_found()).format(message.content[2:])
-            )
-            return
-        if isinstance(tags[message.content[2:]], dict):
-            await message.reply(
-                lang.gstr(KEY.messages.tag.use_slash_command()).format(
-                    message.content[2:]
-                )
-            )
-            return
-        await message.reply(
-            tags[message.content[2:]].format(sender=message.author.mention)
-        )
+    await text_commands.dispatch(message)
 
 
 @bot.event
@@ -533,55 +918,45 @@ async def on_join(member):
         await member.send(
             lang.gstr(KEY.messages.general.welcome()).format(member.mention)
         )
-        await member.guild.get_channel(config.gint(KEY.channels.off_topic())).send(
+        await member.guild.get_channel(settings.off_topic_channel_id).send(
             lang.gstr(KEY.messages.general.join()).format(member.mention)
         )
     else:
-        await member.guild.get_channel(config.gint(KEY.channels.off_topic())).send(
+        await member.guild.get_channel(settings.off_topic_channel_id).send(
             lang.gstr(KEY.messages.general.join_no_dm()).format(member.mention)
         )
-    await member.add_roles(member.guild.get_role(config.gint(KEY.roles.new_member())))
+    if settings.new_member_role_id is not None:
+        await member.add_roles(nextcord.Object(settings.new_member_role_id))
 
 
 @bot.event
 async def on_raw_reaction_add(reaction):
     if reaction.user_id == bot.user.id:
         return
-    if reaction.message_id == config.gint(KEY.features.react_roles.message()):
-        message = await bot.get_channel(
-            config.gint(KEY.features.react_roles.channel())
-        ).fetch_message(config.gint(KEY.features.react_roles.message()))
-        if reaction.emoji.name not in (
-            entry["emoji"] for entry in config.glist(KEY.features.react_roles.roles())
-        ):
-            return await message.remove_reaction(reaction.emoji, reaction.member)
-        role = next(
-            entry["role"]
-            for entry in config.glist(KEY.features.react_roles.roles())
-            if entry["emoji"] == reaction.emoji.name
+    if reaction.message_id != settings.react_roles.message_id:
+        return
+    role = settings.react_roles.roles_by_emoji.get(reaction.emoji.name)
+    if role is None:
+        channel = bot.get_partial_messageable(reaction.channel_id)
+        return await channel.get_partial_message(reaction.message_id).remove_reaction(
+            reaction.emoji, nextcord.Object(reaction.user_id)
         )
-        dc_role = message.guild.get_role(role)
-        if not any(role == roleid for roleid in reaction.member.roles):
-            await reaction.member.add_roles(dc_role)
+    role_queue.add(reaction.member.guild, reaction.user_id, role)
 
 
 @bot.event
 async def on_raw_reaction_remove(reaction):
     if reaction.user_id == bot.user.id:
         return
-    if reaction.message_id == config.gint(KEY.features.react_roles.message()):
-        if reaction.emoji.name not in (
-            entry["emoji"] for entry in config.glist(KEY.features.react_roles.roles())
-        ):
-            return
-        role = next(
-            entry["role"]
-            for entry in config.glist(KEY.features.react_roles.roles())
-            if entry["emoji"] == reaction.emoji.name
-        )
-        dc_role = bot.get_guild(config.glint(KEY.guild())).get_role(role)
-        member = bot.get_guild(config.glint(KEY.guild())).get_member(reaction.user_id)
-        await member.remove_roles(dc_role)
+    if reaction.message_id != settings.react_roles.message_id:
+        return
+    role = settings.react_roles.roles_by_emoji.get(reaction.emoji.name)
+    if role is None:
+        return
+    role_queue.remove(bot.get_guild(reaction.guild_id), reaction.user_id, role)
+
+
+metrics.instrument_events(bot)
 
 
 if __name__ == "__main__":
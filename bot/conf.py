@@ -1,9 +1,14 @@
+import atexit
 import os
 import dotenv
 from pathlib import Path
 
-from utils.config import ConfigFile
-from utils.general import format_string
+from utils.config import ConfigFile, Generation
+from utils.general import compile_string, format_string, templates
+from utils.permissions import PermissionEngine
+from utils.ratelimit import RateLimiter
+from utils.schema import CompiledSettings, ConfigError
+from utils.tags import TagCache, TagIndex
 
 
 dotenv.load_dotenv()
@@ -14,14 +19,49 @@ config_folder = Path("config")
 config_file = ConfigFile(config_folder / "config.yaml")
 lang_file = ConfigFile(config_folder / "language.yaml", default_to="id")
 tags_file = ConfigFile(config_folder / "tags.yaml", default_to="none")
+generation = Generation()
+atexit.register(config_file.save)
+atexit.register(lang_file.save)
+atexit.register(tags_file.save)
 
-def reload_config():
-    config_file.update()
-    lang_file.update()
-    tags_file.update()
+async def reload_config():
+    await config_file.update()
+    await lang_file.update()
+    await tags_file.update()
+    settings.recompile()
+    templates.clear()
     format_string.bind(config=config_file.config, tags=tags_file.config)
+    compile_string.bind(config=config_file.config, tags=tags_file.config)
+    generation.bump()
+
+async def reload_changed_config() -> dict:
+    changes = {config_file: set(), lang_file: set(), tags_file: set()}
+    if config_file.changed_on_disk():
+        previous = config_file.config.data
+        changes[config_file] = await config_file.reload()
+        try:
+            settings.recompile()
+        except ConfigError:
+            config_file.config.data = previous
+            raise
+    if lang_file.changed_on_disk():
+        changes[lang_file] = await lang_file.reload()
+    if tags_file.changed_on_disk():
+        changes[tags_file] = await tags_file.reload()
+    if changes[config_file] or changes[tags_file]:
+        templates.clear()
+    if any(changes.values()):
+        generation.bump()
+    return changes
 
 config = config_file.config
 lang = lang_file.config
 tags = tags_file.config
+settings = CompiledSettings(config)
+permissions = PermissionEngine(settings, generation)
+rate_limiter = RateLimiter(config, generation)
 format_string.bind(config=config, tags=tags)
+compile_string.bind(config=config, tags=tags)
+tag_cache = TagCache(tags, generation)
+tag_index = TagIndex(tags, generation)
+tag_index.rebuild()
@@ -0,0 +1,302 @@
+import asyncio
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import nextcord
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS announcements (
+    message_id INTEGER PRIMARY KEY,
+    channel_id INTEGER NOT NULL,
+    target TEXT NOT NULL,
+    title TEXT,
+    source TEXT NOT NULL,
+    image_url TEXT,
+    thumbnail_url TEXT,
+    attachments TEXT NOT NULL DEFAULT '[]',
+    author_id INTEGER NOT NULL,
+    author_name TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    edited_at TEXT,
+    editor_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS announcements_created_at ON announcements (created_at);
+CREATE TABLE IF NOT EXISTS publish_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch_id INTEGER NOT NULL,
+    target TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    send_at TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TEXT NOT NULL,
+    message_id INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS publish_jobs_due ON publish_jobs (status, next_attempt_at);
+"""
+
+COLUMNS = (
+    "message_id",
+    "channel_id",
+    "target",
+    "title",
+    "source",
+    "image_url",
+    "thumbnail_url",
+    "attachments",
+    "author_id",
+    "author_name",
+    "created_at",
+    "edited_at",
+    "editor_id",
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Announcement:
+    message_id: int
+    channel_id: int
+    target: str
+    title: Optional[str]
+    source: str
+    image_url: Optional[str]
+    thumbnail_url: Optional[str]
+    attachments: tuple
+    author_id: int
+    author_name: str
+    created_at: datetime
+    edited_at: Optional[datetime]
+    editor_id: Optional[int]
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "Announcement":
+        values = dict(zip(COLUMNS, row))
+        values["attachments"] = tuple(json.loads(values["attachments"]))
+        values["created_at"] = datetime.fromisoformat(values["created_at"])
+        if values["edited_at"] is not None:
+            values["edited_at"] = datetime.fromisoformat(values["edited_at"])
+        return cls(**values)
+
+
+@dataclass(frozen=True, slots=True)
+class JobAttachment:
+    path: str
+    filename: str
+    size: int
+    description: Optional[str] = None
+    spoiler: bool = False
+
+    def to_file(self) -> nextcord.File:
+        return nextcord.File(
+            self.path, filename=self.filename, description=self.description, spoiler=self.spoiler
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class PublishJob:
+    id: int
+    batch_id: int
+    target: str
+    payload: dict
+    send_at: datetime
+    attempts: int
+
+    @property
+    def attachments(self) -> tuple:
+        return tuple(JobAttachment(**attachment) for attachment in self.payload.get("attachments", ()))
+
+    @property
+    def image(self) -> Optional[JobAttachment]:
+        return JobAttachment(**self.payload["image"]) if self.payload.get("image") else None
+
+    @property
+    def thumbnail(self) -> Optional[JobAttachment]:
+        return JobAttachment(**self.payload["thumbnail"]) if self.payload.get("thumbnail") else None
+
+
+class SQLiteStore:
+    def __init__(self, path: str | Path) -> None:
+        if not isinstance(path, Path):
+            path = Path(path)
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(SCHEMA)
+
+    def _execute(self, query: str, parameters: tuple = ()) -> list:
+        with self._lock, self._connection:
+            return self._connection.execute(query, parameters).fetchall()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.path}>"
+
+
+class AnnouncementStore(SQLiteStore):
+    async def record(
+        self,
+        message_id: int,
+        channel_id: int,
+        target: str,
+        title: Optional[str],
+        source: str,
+        author_id: int,
+        author_name: str,
+        created_at: datetime,
+        image_url: Optional[str] = None,
+        thumbnail_url: Optional[str] = None,
+        attachments: tuple = (),
+    ) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT OR REPLACE INTO announcements "
+            "(message_id, channel_id, target, title, source, image_url, thumbnail_url, "
+            "attachments, author_id, author_name, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                message_id,
+                channel_id,
+                target,
+                title,
+                source,
+                image_url,
+                thumbnail_url,
+                json.dumps(list(attachments)),
+                author_id,
+                author_name,
+                created_at.isoformat(),
+            ),
+        )
+
+    async def update(
+        self,
+        message_id: int,
+        editor_id: int,
+        edited_at: datetime,
+        title: Optional[str] = None,
+        source: Optional[str] = None,
+    ) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE announcements SET title = COALESCE(?, title), source = COALESCE(?, source), "
+            "edited_at = ?, editor_id = ? WHERE message_id = ?",
+            (title, source, edited_at.isoformat(), editor_id, message_id),
+        )
+
+    async def get(self, message_id: int) -> Optional[Announcement]:
+        rows = await asyncio.to_thread(
+            self._execute,
+            f"SELECT {', '.join(COLUMNS)} FROM announcements WHERE message_id = ?",
+            (message_id,),
+        )
+        return Announcement.from_row(rows[0]) if rows else None
+
+    async def recent(self, query: str = "", limit: int = 25) -> list:
+        rows = await asyncio.to_thread(
+            self._execute,
+            f"SELECT {', '.join(COLUMNS)} FROM announcements "
+            "WHERE title LIKE ? OR target LIKE ? ORDER BY created_at DESC LIMIT ?",
+            (f"%{query}%", f"%{query}%", limit),
+        )
+        return [Announcement.from_row(row) for row in rows]
+
+
+class PublishQueue(SQLiteStore):
+    def _enqueue(self, targets: list, payload: str, send_at: str) -> int:
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT COALESCE(MAX(batch_id), 0) + 1 FROM publish_jobs"
+            ).fetchone()
+            batch_id = row[0]
+            self._connection.executemany(
+                "INSERT INTO publish_jobs (batch_id, target, payload, send_at, next_attempt_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(batch_id, target, payload, send_at, send_at) for target in targets],
+            )
+        return batch_id
+
+    async def enqueue(self, targets: list, payload: dict, send_at: datetime) -> int:
+        return await asyncio.to_thread(
+            self._enqueue, targets, json.dumps(payload), _utc(send_at).isoformat()
+        )
+
+    def _claim_due(self, now: str, limit: int) -> list:
+        with self._lock, self._connection:
+            rows = self._connection.execute(
+                "SELECT id, batch_id, target, payload, send_at, attempts FROM publish_jobs "
+                "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            self._connection.executemany(
+                "UPDATE publish_jobs SET status = 'running' WHERE id = ?",
+                [(row[0],) for row in rows],
+            )
+        return [
+            PublishJob(
+                id=row[0],
+                batch_id=row[1],
+                target=row[2],
+                payload=json.loads(row[3]),
+                send_at=datetime.fromisoformat(row[4]),
+                attempts=row[5],
+            )
+            for row in rows
+        ]
+
+    async def claim_due(self, now: datetime, limit: int = 20) -> list:
+        return await asyncio.to_thread(self._claim_due, _utc(now).isoformat(), limit)
+
+    async def complete(self, job_id: int, message_id: int) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE publish_jobs SET status = 'done', attempts = attempts + 1, message_id = ?, "
+            "error = NULL WHERE id = ?",
+            (message_id, job_id),
+        )
+
+    async def retry(self, job_id: int, next_attempt_at: datetime, error: str) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE publish_jobs SET status = 'pending', attempts = attempts + 1, "
+            "next_attempt_at = ?, error = ? WHERE id = ?",
+            (_utc(next_attempt_at).isoformat(), error, job_id),
+        )
+
+    async def fail(self, job_id: int, error: str) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE publish_jobs SET status = 'failed', attempts = attempts + 1, error = ? "
+            "WHERE id = ?",
+            (error, job_id),
+        )
+
+    async def requeue_running(self) -> None:
+        await asyncio.to_thread(
+            self._execute, "UPDATE publish_jobs SET status = 'pending' WHERE status = 'running'"
+        )
+
+    async def batch_status(self, batch_id: int) -> dict:
+        rows = await asyncio.to_thread(
+            self._execute,
+            "SELECT target, status, message_id, error FROM publish_jobs WHERE batch_id = ?",
+            (batch_id,),
+        )
+        return {row[0]: {"status": row[1], "message_id": row[2], "error": row[3]} for row in rows}
+
+
+def _utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
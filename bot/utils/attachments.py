@@ -0,0 +1,68 @@
+import asyncio
+import shutil
+from pathlib import Path
+from typing import Optional
+
+import aiohttp
+import nextcord
+
+
+class AttachmentBudgetExceeded(Exception):
+    def __init__(self, size: int, budget: int) -> None:
+        super().__init__(f"{size} bytes exceed the budget of {budget} bytes")
+        self.size = size
+        self.budget = budget
+
+
+class AttachmentDownloader:
+    def __init__(
+        self,
+        max_total_bytes: int = 25 * 1024 * 1024,
+        chunk_size: int = 64 * 1024,
+    ) -> None:
+        self.max_total_bytes = max_total_bytes
+        self.chunk_size = chunk_size
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    def check_budget(self, attachments: list) -> int:
+        total = sum(attachment.size for attachment in attachments)
+        if total > self.max_total_bytes:
+            raise AttachmentBudgetExceeded(total, self.max_total_bytes)
+        return total
+
+    async def save(self, attachments: list, directory: Path) -> list:
+        # Discord's attachment URLs expire, so anything published later is copied to disk first.
+        attachments = [attachment for attachment in attachments if attachment]
+        self.check_budget(attachments)
+        directory.mkdir(parents=True, exist_ok=True)
+        paths = [directory / f"{i}-{attachment.filename}" for i, attachment in enumerate(attachments)]
+        results = await asyncio.gather(
+            *(self._save_one(attachment, path) for attachment, path in zip(attachments, paths)),
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise errors[0]
+        return paths
+
+    async def _save_one(self, attachment: nextcord.Attachment, path: Path) -> None:
+        with open(path, "wb") as file:
+            async with self._get_session().get(attachment.url) as response:
+                if response.status != 200:
+                    raise nextcord.HTTPException(response, "failed to get attachment")
+                written = 0
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    written += len(chunk)
+                    if written > self.max_total_bytes:
+                        raise AttachmentBudgetExceeded(written, self.max_total_bytes)
+                    file.write(chunk)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
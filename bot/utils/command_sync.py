@@ -0,0 +1,120 @@
+import asyncio
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Optional
+
+import nextcord
+
+
+def payload_hash(payload: dict) -> str:
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    ).hexdigest()
+
+
+class CommandSync:
+    def __init__(self, bot, path: str | Path, verify_after: float = 86400.0) -> None:
+        if not isinstance(path, Path):
+            path = Path(path)
+        self.bot = bot
+        self.path = path
+        self.verify_after = verify_after
+        self._scopes: Optional[dict] = None
+        # Global and guild syncs run concurrently on connect and share one file.
+        self._lock = asyncio.Lock()
+
+    def _load(self) -> dict:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if data.get("application") != self.bot.application_id:
+            return {}
+        return data.get("scopes", {})
+
+    def _save(self, data: str) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(data, encoding="utf-8")
+
+    def _local(self, guild_id: Optional[int]) -> dict:
+        state = self.bot._connection
+        if guild_id:
+            commands = state.get_guild_application_commands(guild_id, rollout=True)
+        else:
+            commands = state.get_global_application_commands(rollout=True)
+        local = {}
+        for command in commands:
+            payload = command.get_payload(guild_id)
+            local[f"{payload['type']}:{payload['name']}"] = (command, payload_hash(payload))
+        return local
+
+    async def _record(self, scope: str, local: dict, guild_id: Optional[int], verified: float) -> None:
+        self._scopes[scope] = {
+            "verified": verified,
+            "commands": {
+                key: {"hash": digest, "id": command.command_ids[guild_id]}
+                for key, (command, digest) in local.items()
+                if guild_id in command.command_ids
+            },
+        }
+        data = json.dumps({"application": self.bot.application_id, "scopes": self._scopes}, indent=2)
+        await asyncio.to_thread(self._save, data)
+
+    async def sync(self, guild_id: Optional[int] = None) -> str:
+        async with self._lock:
+            if self._scopes is None:
+                self._scopes = await asyncio.to_thread(self._load)
+            return await self._sync(guild_id)
+
+    async def _sync(self, guild_id: Optional[int]) -> str:
+        state = self.bot._connection
+        scope = str(guild_id or "global")
+        stored = self._scopes.get(scope)
+        local = self._local(guild_id)
+        if not local:
+            # Like nextcord, leave guilds alone that never had commands from us.
+            if (stored is None and guild_id) or (stored is not None and not stored["commands"]):
+                return "nothing to sync"
+
+        if stored is None or time.time() - stored["verified"] > self.verify_after:
+            # Unknown or old state: let nextcord compare against what Discord has.
+            await self.bot.sync_application_commands(guild_id=guild_id)
+            await self._record(scope, local, guild_id, time.time())
+            return f"verified {len(local)} commands with Discord"
+
+        known = stored["commands"]
+        unchanged = upserted = 0
+        for key, (command, digest) in local.items():
+            entry = known.get(key)
+            if entry is not None and entry["hash"] == digest:
+                response = {"id": entry["id"]}
+                if guild_id:
+                    response["guild_id"] = guild_id
+                command.parse_discord_response(state, response)
+                state.add_application_command(command, use_rollout=True)
+                unchanged += 1
+            else:
+                await state.register_application_command(command, guild_id)
+                upserted += 1
+        deleted = 0
+        for key in known.keys() - local.keys():
+            try:
+                if guild_id:
+                    await self.bot.http.delete_guild_command(
+                        self.bot.application_id, guild_id, known[key]["id"]
+                    )
+                else:
+                    await self.bot.http.delete_global_command(
+                        self.bot.application_id, known[key]["id"]
+                    )
+            except nextcord.NotFound:
+                pass
+            deleted += 1
+        if upserted or deleted:
+            await self._record(scope, local, guild_id, stored["verified"])
+        return f"{unchanged} unchanged, {upserted} upserted, {deleted} deleted"
+
+    def __repr__(self) -> str:
+        return f"<CommandSync {self.path}>"
@@ -1,106 +1,159 @@
+import asyncio
 import copy
+import hashlib
 import os
+import pickle
 from pathlib import Path
 import shutil
+import tempfile
+import threading
 from typing_extensions import deprecated
 import yaml
 from typing import Optional, Union
 
+try:
+    from yaml import CSafeLoader as SafeLoader, CDumper as Dumper
+except ImportError:
+    from yaml import SafeLoader, Dumper
+
+SNAPSHOT_VERSION = 1
 
 class UNSET: ...
 
 
+def file_hash(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
 class Config:
     def __init__(self, default_to: Optional[str] = UNSET) -> None:
         self.default_to: Optional[str] = default_to
-        self.data: dict = {}
+        self._data: dict = {}
+        self._index: dict = {}
+        self.dirty = False
+        self.on_change = None
         self.load()
 
+    @property
+    def data(self) -> dict:
+        return self._data
+
+    @data.setter
+    def data(self, data: dict) -> None:
+        self._data = data
+        self.reindex()
+
+    def reindex(self) -> None:
+        self._index = {}
+        self._index_tree(None, self._data)
+
+    def _index_tree(self, prefix: Optional[str], value) -> None:
+        if prefix is not None:
+            self._index[prefix] = value
+        if not isinstance(value, dict):
+            return
+        for child, child_value in value.items():
+            if not isinstance(child, str):
+                continue
+            self._index_tree(child if prefix is None else f"{prefix}.{child}", child_value)
+
+    def _unindex(self, key: str) -> None:
+        if key not in self._index:
+            return
+        del self._index[key]
+        prefix = key + "."
+        for path in [path for path in self._index if path.startswith(prefix)]:
+            del self._index[path]
+
+    def _reindex_key(self, key: str) -> None:
+        self._unindex(key)
+        parts = key.split(".")
+        data = self._data
+        for i, part in enumerate(parts):
+            if not isinstance(data, dict) or part not in data:
+                return
+            data = data[part]
+            path = ".".join(parts[: i + 1])
+            if path not in self._index:
+                self._index[path] = data
+        self._index_tree(key, data)
+
+    def _changed(self) -> None:
+        self.dirty = True
+        if self.on_change is not None:
+            self.on_change()
+
+    def _merge(self, data: dict) -> None:
+        self._data.update(data)
+        for key in data:
+            if isinstance(key, str):
+                self._reindex_key(key)
+
     def update(self, data: dict) -> None:
-        self.data.update(data)
+        self._merge(data)
+        self._changed()
 
     def load(self, path: str | Path = "config.yaml") -> None:
         if not isinstance(path, Path):
             path = Path(path)
         if not path.exists():
             return
-        self.update(yaml.safe_load(path.read_text(encoding="utf-8")) or {})
+        self._merge(yaml.load(path.read_bytes(), Loader=SafeLoader) or {})
 
     def save(self, path: str | Path = "config.yaml") -> None:
         if not isinstance(path, Path):
             path = Path(path)
-        path.write_bytes(yaml.dump(self.data, encoding="utf-8"))
+        write_atomic(path, yaml.dump(self.data, Dumper=Dumper, encoding="utf-8"))
+        self.dirty = False
 
     def gobj(self, key: str, default: Optional[dict] = UNSET) -> dict:
-        parts = key.rsplit(".", 1)
-        child = parts[-1]
-        if len(parts) == 1:
-            data = self.data
-        else:
-            data = self.gobj(parts[0])
-        if child in data:
-            return data[child]
+        if key in self._index:
+            return self._index[key]
         return default if default is not UNSET else {}
 
     def glist(self, key: str, default: Optional[list] = None) -> list:
-        parts = key.rsplit(".", 1)
-        child = parts[-1]
-        if len(parts) == 1:
-            data = self.data
-        else:
-            data = self.gobj(parts[0])
-        if child in data:
-            return data[child]
+        if key in self._index:
+            return self._index[key]
         return default if default is not UNSET else []
 
     def gstr(self, key: str, default: Optional[str] = UNSET) -> str:
-        parts = key.rsplit(".", 1)
-        child = parts[-1]
-        if len(parts) == 1:
-            data = self.data
-        else:
-            data = self.gobj(parts[0])
-        if child in data:
-            return data[child]
+        if key in self._index:
+            return self._index[key]
         return default if default is not UNSET else key
 
     def gint(self, key: str, default: Optional[int] = UNSET) -> int:
-        parts = key.rsplit(".", 1)
-        child = parts[-1]
-        if len(parts) == 1:
-            data = self.data
-        else:
-            data = self.gobj(parts[0])
-        if child in data:
-            return data[child]
+        if key in self._index:
+            return self._index[key]
         if default is not UNSET:
             return default
         raise KeyError(key)
 
     def set(self, key: str, value) -> None:
         print("Setting", key, value)
-        parts = key.split(".")
-        data = self.data
-        for part in parts[:-1]:
-            if part not in data:
-                data[part] = {}
-            data = data[part]
-        data[parts[-1]] = value
+        self[key] = value
 
     @deprecated("Use .g*-methods instead")
     def __getitem__(self, key: str) -> Union[None, dict, list, str, int, float, bool]:
-        parts = key.split(".")
-        data = self.data
-        for part in parts:
-            if part not in data:
-                if self.default_to == "id":
-                    return key
-                elif self.default_to == "none":
-                    return None
-                else:
-                    raise KeyError(key)
-            data = data[part]
-        return data
+        if key in self._index:
+            return self._index[key]
+        if self.default_to == "id":
+            return key
+        elif self.default_to == "none":
+            return None
+        raise KeyError(key)
 
     def __setitem__(self, key, value) -> None:
         parts = key.split(".")
@@ -110,6 +163,8 @@ class Config:
                 data[part] = {}
             data = data[part]
         data[parts[-1]] = value
+        self._reindex_key(key)
+        self._changed()
 
     def __delitem__(self, key) -> None:
         parts = key.split(".")
@@ -117,15 +172,11 @@ class Config:
         for part in parts[:-1]:
             data = data[part]
         del data[parts[-1]]
+        self._unindex(key)
+        self._changed()
 
     def __contains__(self, key) -> bool:
-        parts = key.split(".")
-        data = self.data
-        for part in parts:
-            if part not in data:
-                return False
-            data = data[part]
-        return True
+        return key in self._index
 
     def __repr__(self) -> str:
         return f"<Config data={self.data}>"
@@ -140,28 +191,155 @@ class Config:
         return len(self.data)
 
 
+def diff_paths(old, new, prefix: Optional[str] = None) -> set:
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return set() if old == new or prefix is None else {prefix}
+    changed = set()
+    for key in old.keys() | new.keys():
+        path = str(key) if prefix is None else f"{prefix}.{key}"
+        if key not in old or key not in new:
+            changed.add(path)
+        elif old[key] != new[key]:
+            changed.add(path)
+            changed |= diff_paths(old[key], new[key], path)
+    return changed
+
+
+def touches(changed: set, *prefixes: str) -> bool:
+    return any(
+        path == prefix or path.startswith(prefix + ".") or prefix.startswith(path + ".")
+        for path in changed
+        for prefix in prefixes
+    )
+
+
 class ConfigFile:
-    def __init__(self, path: str | Path, **options) -> None:
+    def __init__(self, path: str | Path, save_delay: float = 2.0, **options) -> None:
         if not isinstance(path, Path):
             path = Path(path)
         self.path = path
+        self.save_delay = save_delay
+        self.snapshot_path = self.path.parent / ".cache" / f"{self.path.name}.pickle"
+        self.start_raw_hash: Optional[str] = None
+        self.mtime: Optional[int] = None
         self.config = Config(**options)
-        self.config.load(self.path)
-        self.start_raw_hash = hash(self.path.read_text(encoding="utf-8"))
-        self.start_hash = hash(yaml.dump(self.config.data))
+        self.config._merge(self._read())
+        self._write_lock = threading.Lock()
+        self._save_handle: Optional[asyncio.TimerHandle] = None
+        self._save_task: Optional[asyncio.Task] = None
+        self.config.on_change = self.schedule_save
+
+    def _read(self) -> dict:
+        mtime = self.path.stat().st_mtime_ns
+        raw = self.path.read_bytes()
+        raw_hash = file_hash(raw)
+        data = self._load_snapshot(mtime, raw_hash)
+        if data is None:
+            data = yaml.load(raw, Loader=SafeLoader) or {}
+            self._store_snapshot(mtime, raw_hash, data)
+        self.start_raw_hash = raw_hash
+        self.mtime = mtime
+        return data
 
-    def save(self) -> None:
-        if hash(yaml.dump(self.config.data)) == self.start_hash:
+    def _load_snapshot(self, mtime: int, raw_hash: str) -> Optional[dict]:
+        try:
+            snapshot = pickle.loads(self.snapshot_path.read_bytes())
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            return None
+        if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+            return None
+        if snapshot.get("mtime") != mtime or snapshot.get("hash") != raw_hash:
+            return None
+        if not isinstance(snapshot.get("data"), dict):
+            return None
+        return snapshot["data"]
+
+    def _store_snapshot(self, mtime: int, raw_hash: str, data: dict) -> None:
+        snapshot = {"version": SNAPSHOT_VERSION, "mtime": mtime, "hash": raw_hash, "data": data}
+        try:
+            self.snapshot_path.parent.mkdir(exist_ok=True)
+            write_atomic(self.snapshot_path, pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL))
+        except OSError as e:
+            print("Could not store config snapshot for", self.path, e)
+
+    def _backup_path(self) -> Path:
+        count = len(list(self.path.parent.glob(f"{self.path.name}.*.bak")))
+        return self.path.with_name(f"{self.path.name}.{count}.bak")
+
+    def _write(self, data: dict) -> None:
+        with self._write_lock:
+            raw = yaml.dump(data, Dumper=Dumper, encoding="utf-8")
+            if self.path.exists() and file_hash(self.path.read_bytes()) != self.start_raw_hash:
+                backup_path = self._backup_path()
+                shutil.copy2(self.path, backup_path)
+                print("Config file merge conflict, backing up to", backup_path)
+            write_atomic(self.path, raw)
+            self.start_raw_hash = file_hash(raw)
+            self.mtime = self.path.stat().st_mtime_ns
+            self._store_snapshot(self.mtime, self.start_raw_hash, data)
+
+    def schedule_save(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+        self._save_handle = loop.call_later(self.save_delay, self._start_save)
+
+    def _start_save(self) -> None:
+        self._save_handle = None
+        self._save_task = asyncio.ensure_future(self.save_async())
+
+    async def save_async(self) -> None:
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+        if not self.config.dirty:
             return
-        if self.path.exists() and hash(self.path.read_text(encoding="utf-8")) != self.start_raw_hash:
-            self.path.with_suffix(f"{self.path.suffix}.{len(list(self.path.parent.glob(str(self.path.with_suffix('')) + '*.bak')))}.bak")
-            shutil.move(self.path, self.path)
-            print("Config file merge conflict, backing up to", self.path.with_suffix(f"{self.path.suffix}.bak"))
-        self.config.save(self.path)
+        snapshot = copy.deepcopy(self.config.data)
+        self.config.dirty = False
+        try:
+            await asyncio.to_thread(self._write, snapshot)
+        except BaseException:
+            self.config.dirty = True
+            raise
 
-    def update(self) -> None:
-        self.save()
-        self.config.load(self.path)
+    def save(self) -> None:
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+        if not self.config.dirty:
+            return
+        self.config.dirty = False
+        try:
+            self._write(self.config.data)
+        except BaseException:
+            self.config.dirty = True
+            raise
+
+    async def update(self) -> None:
+        await self.save_async()
+        self.config._merge(await asyncio.to_thread(self._read))
+
+    def changed_on_disk(self) -> bool:
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        return file_hash(self.path.read_bytes()) != self.start_raw_hash
+
+    async def reload(self) -> set:
+        # Parsing and the snapshot write hit the disk, keep them off the event loop.
+        await self.save_async()
+        new_data = await asyncio.to_thread(self._read)
+        changed = diff_paths(self.config.data, new_data)
+        if changed:
+            self.config.data = new_data
+        return changed
 
     def get_backup(self) -> dict:
         return copy.deepcopy(self.config.data)
@@ -169,9 +347,6 @@ class ConfigFile:
     def restore_backup(self, backup: dict) -> None:
         self.config.data = backup
 
-    def __del__(self) -> None:
-        self.save()
-
     def try_to_change(self) -> "TryChangeConfig":
         return TryChangeConfig(self)
 
@@ -190,27 +365,52 @@ class TryChangeConfig:
             self.config_file.restore_backup(self.backup)
 
 
+class Generation:
+    def __init__(self) -> None:
+        self.value = 0
+
+    def bump(self) -> int:
+        self.value += 1
+        return self.value
+
+    def __repr__(self) -> str:
+        return f"<Generation {self.value}>"
+
+
 class Key:
     def __init__(self, key: Optional[list] = None) -> None:
-        self.key = key or []
+        self._parts = tuple(key or ())
+        self._path = ".".join(self._parts)
+        self._children: dict = {}
+
+    @property
+    def key(self) -> list:
+        return list(self._parts)
+
+    def _child(self, key: str) -> "Key":
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = Key([*self._parts, key.replace("_", "-")])
+        return child
 
     def __getattr__(self, key: str) -> "Key":
-        key = key.replace("_", "-")
-        if self.key:
-            return Key(self.key + [key])
-        return Key([key])
+        if key.startswith("__"):
+            raise AttributeError(key)
+        # Cache the child on the instance so later lookups never reach __getattr__.
+        child = self.__dict__[key] = self._child(key)
+        return child
 
     def __getitem__(self, key: str) -> "Key":
-        return self.__getattr__(key)
+        return self._child(key)
 
     def __str__(self) -> str:
-        return ".".join(self.key)
+        return self._path
 
     def __repr__(self) -> str:
-        return f"KEY.{self.key}"
+        return f"KEY.{list(self._parts)}"
 
     def __call__(self) -> str:
-        return str(self)
+        return self._path
 
 
 KEY = Key()
@@ -1,8 +1,9 @@
 from functools import wraps
 
 import nextcord
-from conf import config, lang
+from conf import config, lang, permissions, rate_limiter
 from utils.config import KEY
+from utils.permissions import member_role_ids
 
 
 def require_role(role: int):
@@ -14,7 +15,7 @@ def require_role(role: int):
                     lang.gstr(KEY.messages.no_permission.to_run_command()),
                     ephemeral=True,
                 )
-            if role not in [role.id for role in interaction.user.roles]:
+            if role not in member_role_ids(interaction.user):
                 return await interaction.response.send_message(
                     lang.gstr(KEY.messages.no_permission.to_run_command()),
                     ephemeral=True,
@@ -27,6 +28,8 @@ def require_role(role: int):
 
 
 def require_any_role_of(*roles):
+    roles = frozenset(roles)
+
     def decorator(func):
         @wraps(func)
         async def wrapper(interaction: nextcord.Interaction, *args, **kwargs):
@@ -35,7 +38,23 @@ def require_any_role_of(*roles):
                     lang.gstr(KEY.messages.no_permission.to_run_command()),
                     ephemeral=True,
                 )
-            if not any(role.id in roles for role in interaction.user.roles):
+            if roles.isdisjoint(member_role_ids(interaction.user)):
+                return await interaction.response.send_message(
+                    lang.gstr(KEY.messages.no_permission.to_run_command()),
+                    ephemeral=True,
+                )
+            return await func(interaction, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def require_permission(name: str):
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(interaction: nextcord.Interaction, *args, **kwargs):
+            if interaction.user is None or not permissions.check(name, interaction.user):
                 return await interaction.response.send_message(
                     lang.gstr(KEY.messages.no_permission.to_run_command()),
                     ephemeral=True,
@@ -47,6 +66,29 @@ def require_any_role_of(*roles):
     return decorator
 
 
+def rate_limit(name: str):
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(context, *args, **kwargs):
+            if isinstance(context, nextcord.Interaction):
+                user_id, channel_id = context.user.id, context.channel_id
+            else:
+                user_id, channel_id = context.author.id, context.channel.id
+            retry_after = rate_limiter.check(name, user_id, channel_id)
+            if not retry_after:
+                return await func(context, *args, **kwargs)
+            # Text commands are dropped silently; interactions have to be answered.
+            if isinstance(context, nextcord.Interaction):
+                return await context.response.send_message(
+                    lang.gstr(KEY.messages.rate_limited()).format(int(retry_after) + 1),
+                    ephemeral=True,
+                )
+
+        return wrapper
+
+    return decorator
+
+
 def cmddef(*names):
     name = names[-1]
     return {
@@ -74,3 +116,4 @@ async def can_dm_user(user: nextcord.User) -> bool:
     except nextcord.HTTPException:
         return True
     raise ValueError("Unexpected success occurred while checking if user can be DMed.")
+
@@ -0,0 +1,57 @@
+from typing import Awaitable, Callable, Optional
+
+import nextcord
+
+Handler = Callable[[nextcord.Message, str], Awaitable[None]]
+
+
+class PrefixDispatcher:
+    def __init__(self) -> None:
+        self._handlers: dict = {}
+        self._by_lead: dict = {}
+
+    def register(self, prefix: str, handler: Handler) -> None:
+        if not prefix:
+            raise ValueError("prefix must not be empty")
+        self._handlers[prefix] = handler
+        self._rebuild()
+
+    def unregister(self, prefix: str) -> None:
+        del self._handlers[prefix]
+        self._rebuild()
+
+    def command(self, prefix: str):
+        def decorator(func: Handler) -> Handler:
+            self.register(prefix, func)
+            return func
+
+        return decorator
+
+    def _rebuild(self) -> None:
+        by_lead = {}
+        for prefix in sorted(self._handlers, key=len, reverse=True):
+            by_lead.setdefault(prefix[0], []).append((prefix, len(prefix)))
+        self._by_lead = {lead: tuple(prefixes) for lead, prefixes in by_lead.items()}
+
+    def match(self, content: str) -> Optional[tuple]:
+        candidates = self._by_lead.get(content[:1])
+        if candidates is None:
+            return None
+        for prefix, length in candidates:
+            if content.startswith(prefix):
+                return self._handlers[prefix], content[length:]
+        return None
+
+    async def dispatch(self, message: nextcord.Message) -> bool:
+        matched = self.match(message.content)
+        if matched is None:
+            return False
+        handler, argument = matched
+        await handler(message, argument)
+        return True
+
+    def __contains__(self, prefix: str) -> bool:
+        return prefix in self._handlers
+
+    def __repr__(self) -> str:
+        return f"<PrefixDispatcher {list(self._handlers)}>"
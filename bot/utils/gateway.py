@@ -0,0 +1,150 @@
+import json
+import os
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Optional
+
+import nextcord
+
+from utils.config import KEY, Config
+from utils.schema import ConfigError
+
+CHUNK_MODES = ("startup", "never")
+
+
+@dataclass(frozen=True, slots=True)
+class GatewayProfile:
+    name: str
+    presences: bool
+    members: bool
+    message_content: bool
+    cache_joined: bool
+    cache_voice: bool
+    chunk: str
+    max_messages: Optional[int]
+
+    def intents(self) -> nextcord.Intents:
+        intents = nextcord.Intents.default()
+        intents.presences = self.presences
+        intents.members = self.members
+        intents.message_content = self.message_content
+        return intents
+
+    def member_cache_flags(self) -> nextcord.MemberCacheFlags:
+        return nextcord.MemberCacheFlags(
+            joined=self.cache_joined and self.members,
+            voice=self.cache_voice,
+        )
+
+    def client_options(self) -> dict:
+        return {
+            "intents": self.intents(),
+            "member_cache_flags": self.member_cache_flags(),
+            "chunk_guilds_at_startup": self.chunk == "startup",
+            "max_messages": self.max_messages,
+        }
+
+
+PROFILES = {
+    # What the bot used before profiles existed.
+    "full": GatewayProfile(
+        name="full",
+        presences=True,
+        members=True,
+        message_content=True,
+        cache_joined=True,
+        cache_voice=True,
+        chunk="startup",
+        max_messages=1000,
+    ),
+    # Members are only cached once they join or show up in an event; role
+    # changes for everyone else go through the REST API by ID.
+    "lean": GatewayProfile(
+        name="lean",
+        presences=False,
+        members=True,
+        message_content=True,
+        cache_joined=True,
+        cache_voice=False,
+        chunk="never",
+        max_messages=100,
+    ),
+}
+
+
+def load_profile(config: Config) -> GatewayProfile:
+    key = KEY.features.gateway()
+    name = config.gstr(f"{key}.profile", "full")
+    overrides = config.gobj(f"{key}.profiles.{name}", {})
+    if name not in PROFILES and not overrides:
+        raise ConfigError(f"{key}.profile", f"unknown profile {name!r}")
+    profile = PROFILES.get(name, PROFILES["full"])
+    fields = {}
+    for option, value in overrides.items():
+        field = option.replace("-", "_")
+        if field not in GatewayProfile.__dataclass_fields__ or field == "name":
+            raise ConfigError(f"{key}.profiles.{name}.{option}", "unknown option")
+        fields[field] = value
+    profile = replace(profile, name=name, **fields)
+    if profile.chunk not in CHUNK_MODES:
+        raise ConfigError(f"{key}.profiles.{name}.chunk", f"expected one of {', '.join(CHUNK_MODES)}")
+    if profile.chunk == "startup" and not profile.members:
+        raise ConfigError(f"{key}.profiles.{name}.chunk", "chunking needs the members intent")
+    return profile
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class GatewayReport:
+    def __init__(self, path: str | Path) -> None:
+        if not isinstance(path, Path):
+            path = Path(path)
+        self.path = path
+
+    def _load(self) -> dict:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def record(self, profile: GatewayProfile, bot, gateway_bytes: int, gateway_events: int) -> str:
+        sample = {
+            "rss": rss_bytes(),
+            "gateway-bytes": gateway_bytes,
+            "gateway-events": gateway_events,
+            "cached-members": sum(len(guild.members) for guild in bot.guilds),
+            "member-count": sum(guild.member_count or 0 for guild in bot.guilds),
+        }
+        samples = self._load()
+        samples[profile.name] = sample
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(samples, indent=2), encoding="utf-8")
+
+        lines = [
+            f"Gateway profile {profile.name!r}: intents={profile.intents().value}, "
+            f"presences={profile.presences}, chunk={profile.chunk}, "
+            f"max-messages={profile.max_messages}",
+            f"  RSS {sample['rss'] / 2**20:.1f} MiB, "
+            f"{sample['gateway-bytes'] / 2**10:.0f} KiB in {sample['gateway-events']} gateway events, "
+            f"{sample['cached-members']}/{sample['member-count']} members cached",
+        ]
+        baseline = samples.get("full")
+        if profile.name == "full" or baseline is None:
+            if profile.name != "full":
+                lines.append("  No baseline yet; start once with profile 'full' to compare.")
+            return "\n".join(lines)
+        lines.append(
+            f"  Compared with 'full': "
+            f"RSS {(baseline['rss'] - sample['rss']) / 2**20:+.1f} MiB saved, "
+            f"gateway {(baseline['gateway-bytes'] - sample['gateway-bytes']) / 2**10:+.0f} KiB saved, "
+            f"{baseline['cached-members'] - sample['cached-members']} fewer members cached"
+        )
+        return "\n".join(lines)
@@ -1,4 +1,6 @@
 import re
+import time
+from collections import OrderedDict
 
 
 def renamed_class(cls, name):
@@ -61,34 +63,199 @@ def bindable(func):
     return BindableFunction(func)
 
 
+class LRUCache:
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        if key not in self.entries:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        return self.entries.pop(key, default)
+
+    def clear(self):
+        self.entries.clear()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __repr__(self):
+        return f"<LRUCache {len(self.entries)}/{self.maxsize} hits={self.hits} misses={self.misses}>"
+
+
+class TTLCache(LRUCache):
+    def __init__(self, maxsize=128, ttl=60.0):
+        super().__init__(maxsize)
+        self.ttl = ttl
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is not None and entry[1] <= time.monotonic():
+            del self.entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value, ttl=None):
+        super().put(key, (value, time.monotonic() + (self.ttl if ttl is None else ttl)))
+
+    def replace(self, key, value):
+        # Swaps the value but keeps the original expiry.
+        entry = self.entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return False
+        self.entries[key] = (value, entry[1])
+        return True
+
+    def pop(self, key, default=None):
+        entry = self.entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def __contains__(self, key):
+        return self.get(key, self) is not self
+
+    def __repr__(self):
+        return (
+            f"<TTLCache {len(self.entries)}/{self.maxsize} ttl={self.ttl} "
+            f"hits={self.hits} misses={self.misses}>"
+        )
+
+
+SENDER = object()
+
+ROLE_PATTERN = re.compile(r"\@\&(\S*)(\s|\>\>)")
+CHANNEL_PATTERN = re.compile(r"#(\S*)(\s|\>\>)")
+TAG_PATTERN = re.compile(r"!!(\S+?)(\s|\>\>)")
+
+
+class Template:
+    def __init__(self, parts):
+        self.parts = tuple(parts)
+
+    def render(self, sender=None):
+        if len(self.parts) == 1 and self.parts[0] is not SENDER:
+            return self.parts[0]
+        sender = sender or "@here"
+        return "".join(sender if part is SENDER else part for part in self.parts)
+
+    def __repr__(self):
+        return f"<Template parts={len(self.parts)}>"
+
+
+class TemplateCompiler:
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self.templates = OrderedDict()
+        self.tag_bodies = {}
+        self._expanding = []
+
+    def clear(self):
+        self.templates.clear()
+        self.tag_bodies.clear()
+
+    def get(self, string, config, tags):
+        template = self.templates.get(string)
+        if template is not None:
+            self.templates.move_to_end(string)
+            return template
+        template = self.compile(string, config, tags)
+        self.templates[string] = template
+        if len(self.templates) > self.maxsize:
+            self.templates.popitem(last=False)
+        return template
+
+    def compile(self, string, config, tags, thisis=None):
+        parts = []
+        for index, literal in enumerate(string.split("@!sender")):
+            if index:
+                parts.append(SENDER)
+            parts.append(literal)
+
+        roles = config.gobj("roles")
+        channels = config.gobj("channels")
+
+        def role_ref(match):
+            end = "" if match.group(2) == ">>" else " "
+            if match.group(1) not in roles:
+                return f"@{match.group(1)}{end}"
+            return f"<@&{roles[match.group(1)]}>{end}"
+
+        def channel_ref(match):
+            end = "" if match.group(2) == ">>" else " "
+            if match.group(1) not in channels:
+                return f"#{match.group(1)}{end}"
+            return f"<#{channels[match.group(1)]}>{end}"
+
+        def tag_ref(match):
+            end = "" if match.group(2) == ">>" else " "
+            name = match.group(1)
+            if not isinstance(tags.data.get(name), str):
+                return f"!!{name}{end}"
+            if name == thisis or name in self._expanding:
+                return f"[...recursive]{end}"
+            return self.expand_tag(name, end, config, tags)
+
+        parts = self._substitute(parts, ROLE_PATTERN, role_ref)
+        parts = self._substitute(parts, CHANNEL_PATTERN, channel_ref)
+        parts = self._substitute(parts, TAG_PATTERN, tag_ref)
+        return Template(parts)
+
+    def expand_tag(self, name, end, config, tags):
+        if (name, end) in self.tag_bodies:
+            return self.tag_bodies[name, end]
+        self._expanding.append(name)
+        try:
+            body = self.compile(tags.data[name] + end, config, tags, thisis=name).render()
+        finally:
+            self._expanding.pop()
+        if not self._expanding:
+            self.tag_bodies[name, end] = body
+        return body
+
+    @staticmethod
+    def _substitute(parts, pattern, replace):
+        result = []
+        for part in parts:
+            if part is not SENDER:
+                part = pattern.sub(replace, part)
+                if result and result[-1] is not SENDER:
+                    result[-1] += part
+                    continue
+            result.append(part)
+        return result
+
+
+templates = TemplateCompiler()
+
 
 @bindable
 def format_string(string, sender=None, thisis=None, config=None, tags=None):
-    string = string.replace(r"@!sender", sender or "@here")
-
-    def replace1(match):
-        end = "" if match.group(2) == ">>" else " "
-        if match.group(1) not in config["roles"]:
-            return f"@{match.group(1)}{end}"
-        return f"<@&{config['roles'][match.group(1)]}>{end}"
-
-    string = re.sub(r"\@\&(\S*)(\s|\>\>)", replace1, string)
-
-    def replace2(match):
-        end = "" if match.group(2) == ">>" else " "
-        if match.group(1) not in config["channels"]:
-            return f"#{match.group(1)}{end}"
-        return f"<#{config['channels'][match.group(1)]}>{end}"
-
-    string = re.sub(r"#(\S*)(\s|\>\>)", replace2, string)
-
-    def replace3(match):
-        end = "" if match.group(2) == ">>" else " "
-        if match.group(1) not in tags.data.keys():
-            return f"!!{match.group(1)}{end}"
-        if match.group(1) == thisis:
-            return f"[...recursive]{end}"
-        return format_string(tags[match.group(1)] + end, thisis=match.group(1))
-
-    string = re.sub(r"!!(\S+?)(\s|\>\>)", replace3, string)
-    return string
+    if thisis is not None:
+        return templates.compile(string, config, tags, thisis=thisis).render(sender)
+    return templates.get(string, config, tags).render(sender)
+
+
+@bindable
+def compile_string(string, config=None, tags=None):
+    return templates.get(string, config, tags)
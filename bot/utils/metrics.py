@@ -0,0 +1,252 @@
+import asyncio
+import contextvars
+import time
+from collections import defaultdict
+from functools import wraps
+from typing import Optional
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+current_handler: contextvars.ContextVar = contextvars.ContextVar("current_handler", default="idle")
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list:
+        total, result = 0, []
+        for bound, count in zip((*BUCKETS, float("inf")), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        lower, seen = 0.0, 0
+        for bound, count in zip((*BUCKETS, BUCKETS[-1]), self.counts):
+            if count and seen + count >= rank:
+                return lower + (bound - lower) * (rank - seen) / count
+            lower, seen = bound, seen + count
+        return BUCKETS[-1]
+
+
+def _labels(**labels) -> str:
+    return ",".join(
+        f'{name}="{str(value).replace(chr(34), chr(39))}"' for name, value in labels.items()
+    )
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.started = time.time()
+        self.latency: dict = defaultdict(Histogram)
+        self.errors: dict = defaultdict(int)
+        self.rest_calls: dict = defaultdict(int)
+        self.rest_errors: dict = defaultdict(int)
+        self.ratelimits: dict = defaultdict(int)
+        self.exhausted_buckets: dict = defaultdict(int)
+        self.gateway_events: dict = defaultdict(int)
+        self.gateway_bytes = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def timed(self, name: str):
+        def decorator(func):
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                token = current_handler.set(name)
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    self.errors[name] += 1
+                    raise
+                finally:
+                    self.latency[name].observe(time.perf_counter() - start)
+                    current_handler.reset(token)
+
+            return wrapper
+
+        return decorator
+
+    def instrument_events(self, bot) -> None:
+        # Wraps every handler registered with @bot.event; call after all of them are defined.
+        for name, func in list(vars(bot).items()):
+            if name.startswith("on_") and asyncio.iscoroutinefunction(func):
+                setattr(bot, name, self.timed(f"event.{name[3:]}")(func))
+
+    def instrument_commands(self, bot) -> None:
+        @bot.application_command_before_invoke
+        async def before_invoke(interaction) -> None:
+            name = f"command.{interaction.application_command.qualified_name}"
+            interaction.attached.metrics = (name, current_handler.set(name), time.perf_counter())
+
+        @bot.application_command_after_invoke
+        async def after_invoke(interaction) -> None:
+            name, token, start = interaction.attached.metrics
+            self.latency[name].observe(time.perf_counter() - start)
+            current_handler.reset(token)
+
+        async def on_application_command_error(interaction, error) -> None:
+            if interaction.application_command is not None:
+                self.errors[f"command.{interaction.application_command.qualified_name}"] += 1
+
+        async def on_http_ratelimit(limit, remaining, retry_after, bucket, scope) -> None:
+            # nextcord also fires this when a successful response empties a bucket.
+            # Discord only sends X-RateLimit-Scope with an actual 429.
+            if scope is None:
+                self.exhausted_buckets[current_handler.get()] += 1
+            else:
+                self.ratelimits[(current_handler.get(), scope)] += 1
+
+        async def on_global_http_ratelimit(retry_after) -> None:
+            self.ratelimits[(current_handler.get(), "global")] += 1
+
+        async def on_socket_event_type(event_type) -> None:
+            self.gateway_events[event_type] += 1
+
+        async def on_socket_raw_receive(msg) -> None:
+            self.gateway_bytes += len(msg)
+
+        bot.add_listener(on_application_command_error)
+        bot.add_listener(on_http_ratelimit)
+        bot.add_listener(on_global_http_ratelimit)
+        bot.add_listener(on_socket_event_type)
+        bot.add_listener(on_socket_raw_receive)
+
+    def instrument_http(self, http) -> None:
+        request = http.request
+
+        @wraps(request)
+        async def instrumented(route, **kwargs):
+            key = (current_handler.get(), route.method, route.path)
+            self.rest_calls[key] += 1
+            try:
+                return await request(route, **kwargs)
+            except Exception as e:
+                status = getattr(e, "status", e.__class__.__name__)
+                self.rest_errors[(*key, status)] += 1
+                if status == 429:
+                    # Not retried by nextcord, e.g. a Cloudflare ban; no event is fired for it.
+                    self.ratelimits[(key[0], "cloudflare")] += 1
+                raise
+
+        http.request = instrumented
+
+    def uptime(self) -> float:
+        return time.time() - self.started
+
+    def summary(self, limit: int = 10) -> str:
+        lines = [
+            f"Uptime: {self.uptime() / 3600:.1f} h",
+            "",
+            "Handler          calls    p50     p99   errors",
+        ]
+        for name, histogram in sorted(self.latency.items(), key=lambda item: -item[1].sum)[:limit]:
+            lines.append(
+                f"{name[:16]:<16} {histogram.count:>5} {histogram.quantile(0.5) * 1000:>5.0f}ms "
+                f"{histogram.quantile(0.99) * 1000:>5.0f}ms {self.errors.get(name, 0):>6}"
+            )
+        lines += ["", "REST calls"]
+        rest_calls = sorted(self.rest_calls.items(), key=lambda item: -item[1])
+        for (handler, method, path), count in rest_calls[:limit]:
+            lines.append(f"{count:>6} {method} {path} ({handler})")
+        ratelimited = sum(self.ratelimits.values())
+        lines += [
+            "",
+            f"429 responses: {ratelimited}",
+            f"Rate-limit buckets exhausted: {sum(self.exhausted_buckets.values())}",
+        ]
+        minutes = max(self.uptime() / 60, 1 / 60)
+        lines += ["", "Gateway events/min"]
+        gateway_events = sorted(self.gateway_events.items(), key=lambda item: -item[1])
+        for event_type, count in gateway_events[:limit]:
+            lines.append(f"{count / minutes:>8.1f} {event_type}")
+        return "\n".join(lines)
+
+    def exposition(self) -> str:
+        lines = [
+            "# TYPE mssbot_uptime_seconds gauge",
+            f"mssbot_uptime_seconds {self.uptime():.0f}",
+            "# TYPE mssbot_handler_latency_seconds histogram",
+        ]
+        for name, histogram in self.latency.items():
+            for bound, count in histogram.cumulative():
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                labels = _labels(handler=name, le=le)
+                lines.append(f"mssbot_handler_latency_seconds_bucket{{{labels}}} {count}")
+            labels = _labels(handler=name)
+            lines.append(f"mssbot_handler_latency_seconds_sum{{{labels}}} {histogram.sum}")
+            lines.append(f"mssbot_handler_latency_seconds_count{{{labels}}} {histogram.count}")
+        lines.append("# TYPE mssbot_handler_errors_total counter")
+        for name, count in self.errors.items():
+            lines.append(f"mssbot_handler_errors_total{{{_labels(handler=name)}}} {count}")
+        lines.append("# TYPE mssbot_rest_requests_total counter")
+        for (handler, method, path), count in self.rest_calls.items():
+            labels = _labels(handler=handler, method=method, route=path)
+            lines.append(f"mssbot_rest_requests_total{{{labels}}} {count}")
+        lines.append("# TYPE mssbot_rest_errors_total counter")
+        for (handler, method, path, status), count in self.rest_errors.items():
+            labels = _labels(handler=handler, method=method, route=path, status=status)
+            lines.append(f"mssbot_rest_errors_total{{{labels}}} {count}")
+        lines.append("# TYPE mssbot_rest_ratelimited_total counter")
+        for (handler, scope), count in self.ratelimits.items():
+            labels = _labels(handler=handler, scope=scope)
+            lines.append(f"mssbot_rest_ratelimited_total{{{labels}}} {count}")
+        lines.append("# TYPE mssbot_rest_buckets_exhausted_total counter")
+        for handler, count in self.exhausted_buckets.items():
+            lines.append(f"mssbot_rest_buckets_exhausted_total{{{_labels(handler=handler)}}} {count}")
+        lines.append("# TYPE mssbot_gateway_events_total counter")
+        for event_type, count in self.gateway_events.items():
+            lines.append(f"mssbot_gateway_events_total{{{_labels(type=event_type)}}} {count}")
+        lines.append("# TYPE mssbot_gateway_received_bytes_total counter")
+        lines.append(f"mssbot_gateway_received_bytes_total {self.gateway_bytes}")
+        return "\n".join(lines) + "\n"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await asyncio.wait_for(reader.readline(), 5)
+            parts = request.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1] == "/metrics":
+                status, body = "200 OK", self.exposition().encode()
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(
+                f"HTTP/1.0 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 9108) -> None:
+        if self._server is None:
+            self._server = await asyncio.start_server(self._handle, host, port)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def __repr__(self) -> str:
+        return f"<Metrics handlers={len(self.latency)} rest-routes={len(self.rest_calls)}>"
@@ -0,0 +1,76 @@
+import time
+from typing import Callable, Iterable, Mapping
+
+from utils.config import Generation
+from utils.schema import CompiledSettings, Settings
+
+
+def member_role_ids(member) -> Iterable[int]:
+    # nextcord keeps a member's role IDs in the private Member._roles; reading it
+    # avoids resolving every Role object through the guild like Member.roles does.
+    # Anything without it (users, stand-ins) goes through the public API.
+    role_ids = getattr(member, "_roles", None)
+    if role_ids is None:
+        return frozenset(role.id for role in getattr(member, "roles", ()))
+    return role_ids
+
+
+class PermissionEngine:
+    def __init__(self, settings: CompiledSettings, generation: Generation) -> None:
+        self.settings = settings
+        self.generation = generation
+        self._resolvers: dict = {}
+        self._rules: dict = {}
+        self._rules_generation = None
+        self._settings = None
+        self.timings: dict = {}
+
+    def rule(self, name: str, resolver: Callable[[Settings], object]) -> None:
+        self._resolvers[name] = resolver
+        self._rules_generation = None
+
+    def rebuild(self) -> None:
+        settings = self.settings.current
+        rules = {}
+        for name, resolver in self._resolvers.items():
+            resolved = resolver(settings)
+            if isinstance(resolved, Mapping):
+                for key, role_ids in resolved.items():
+                    rules[f"{name}.{key}"] = frozenset(role_ids)
+            else:
+                rules[name] = frozenset(resolved)
+        self._rules = rules
+        self._rules_generation = self.generation.value
+        self._settings = settings
+
+    def _ensure_current(self) -> None:
+        if self._rules_generation != self.generation.value or self._settings is not self.settings.current:
+            self.rebuild()
+
+    def check(self, name: str, member) -> bool:
+        start = time.perf_counter()
+        self._ensure_current()
+        allowed = not self._rules.get(name, frozenset()).isdisjoint(member_role_ids(member))
+        self._record(name, time.perf_counter() - start)
+        return allowed
+
+    def _record(self, name: str, duration: float) -> None:
+        timing = self.timings.get(name)
+        if timing is None:
+            timing = self.timings[name] = {"checks": 0, "total": 0.0, "max": 0.0}
+        timing["checks"] += 1
+        timing["total"] += duration
+        if duration > timing["max"]:
+            timing["max"] = duration
+
+    def stats(self) -> dict:
+        return {
+            "rules": len(self._rules),
+                    "timings": {
+                name: {**timing, "avg": timing["total"] / timing["checks"]}
+                for name, timing in self.timings.items()
+            },
+        }
+
+    def __repr__(self) -> str:
+        return f"<PermissionEngine rules={len(self._rules)}>"
@@ -0,0 +1,189 @@
+import random
+import time
+from collections import deque
+from typing import Optional
+
+import nextcord
+
+from utils.schema import Activity, CompiledSettings
+
+
+def build_activity(entry: Activity) -> nextcord.BaseActivity:
+    if entry.type == "playing":
+        return nextcord.Game(
+            name=entry.name or "mit jemandem, der die Konfiguration zerschossen hat"
+        )
+    if entry.type == "listening":
+        return nextcord.Activity(
+            type=nextcord.ActivityType.listening,
+            name=entry.name or "wie jemand die Konfiguration zerschossen hat",
+        )
+    if entry.type == "watching":
+        return nextcord.Activity(
+            type=nextcord.ActivityType.watching,
+            name=entry.name or "jemandem, der die Konfiguration zerschossen hat",
+        )
+    if entry.type == "streaming":
+        return nextcord.Streaming(
+            name=entry.name or "wie jemand die Konfiguration zerschossen hat",
+            url=entry.url or "https://twitch.tv/JoJoJux16",
+        )
+    return nextcord.Activity(
+        type=nextcord.ActivityType.watching,
+        name="den Typen an, der die Konfiguration zerschossen hat",
+    )
+
+
+class EndpointBudget:
+    def __init__(self, limit: int, per: float) -> None:
+        self.limit = limit
+        self.per = per
+        self.calls: deque = deque()
+
+    def _expire(self, now: float) -> None:
+        while self.calls and now - self.calls[0] >= self.per:
+            self.calls.popleft()
+
+    def available(self, now: float) -> bool:
+        self._expire(now)
+        return len(self.calls) < self.limit
+
+    def spend(self, now: float) -> None:
+        self.calls.append(now)
+
+    def __repr__(self) -> str:
+        return f"<EndpointBudget {len(self.calls)}/{self.limit} per {self.per}s>"
+
+
+class RotationSlot:
+    def __init__(self, interval: float, budget: EndpointBudget, max_backoff: int = 32) -> None:
+        self.interval = interval
+        self.budget = budget
+        self.max_backoff = max_backoff
+        self.backoff = 1
+        self.next_due = 0.0
+        self.calls = 0
+        self.skipped = 0
+        self.deferred = 0
+        self.rate_limited = 0
+
+    def is_due(self, now: float) -> bool:
+        if now < self.next_due:
+            return False
+        if not self.budget.available(now):
+            self.deferred += 1
+            self.next_due = now + self.interval
+            return False
+        return True
+
+    def skip(self, now: float) -> None:
+        self.skipped += 1
+        self.next_due = now + self.interval
+
+    def succeed(self, now: float) -> None:
+        self.calls += 1
+        self.budget.spend(now)
+        self.backoff = 1
+        self.next_due = now + self.interval
+
+    def fail(self, now: float, retry_after: float = 0.0) -> None:
+        self.calls += 1
+        self.rate_limited += 1
+        self.budget.spend(now)
+        self.backoff = min(self.backoff * 2, self.max_backoff)
+        self.next_due = now + max(retry_after, self.interval * self.backoff)
+
+    def stats(self) -> dict:
+        return {
+            "interval": self.interval,
+            "backoff": self.backoff,
+            "calls": self.calls,
+            "skipped": self.skipped,
+            "deferred": self.deferred,
+            "rate-limited": self.rate_limited,
+        }
+
+
+class PresenceScheduler:
+    def __init__(self, settings: CompiledSettings) -> None:
+        self.settings = settings
+        self.slots = {
+            "activity": RotationSlot(30, EndpointBudget(5, 60)),
+            "name": RotationSlot(1800, EndpointBudget(2, 3600)),
+            "nick": RotationSlot(300, EndpointBudget(5, 60)),
+        }
+        self._activity: Optional[Activity] = None
+        self.configure()
+
+    def configure(self) -> None:
+        for name, slot in self.slots.items():
+            slot.interval = self.settings.profile.intervals.get(name, slot.interval)
+
+    @property
+    def saved(self) -> int:
+        return sum(slot.skipped + slot.deferred for slot in self.slots.values())
+
+    async def tick(self, bot: nextcord.Client) -> None:
+        now = time.monotonic()
+        if self.slots["activity"].is_due(now):
+            await self._run(self.slots["activity"], now, self._rotate_activity(bot))
+        if self.slots["name"].is_due(now):
+            await self._run(self.slots["name"], now, self._rotate_name(bot))
+        if self.slots["nick"].is_due(now):
+            await self._run(self.slots["nick"], now, self._rotate_nick(bot))
+
+    async def _run(self, slot: RotationSlot, now: float, rotation) -> None:
+        try:
+            changed = await rotation
+        except nextcord.HTTPException as e:
+            retry_after = 0.0
+            if e.status == 429 and e.response is not None:
+                retry_after = float(e.response.headers.get("Retry-After", 0))
+            slot.fail(now, retry_after)
+            print("Presence rotation failed, backing off:", e)
+            return
+        if changed:
+            slot.succeed(now)
+        else:
+            slot.skip(now)
+
+    async def _rotate_activity(self, bot: nextcord.Client) -> bool:
+        activities = self.settings.profile.activities
+        if not activities:
+            return False
+        entry = random.choice(activities)
+        if entry == self._activity:
+            return False
+        await bot.change_presence(activity=build_activity(entry))
+        self._activity = entry
+        return True
+
+    async def _rotate_name(self, bot: nextcord.Client) -> bool:
+        names = self.settings.profile.names
+        if not names:
+            return False
+        name = random.choice(names)
+        if name == bot.user.name:
+            return False
+        await bot.user.edit(username=name)
+        return True
+
+    async def _rotate_nick(self, bot: nextcord.Client) -> bool:
+        nicks = self.settings.profile.nicks
+        guild = bot.get_guild(self.settings.guild_id)
+        if not nicks or guild is None:
+            return False
+        nick = random.choice(nicks)
+        if nick == guild.me.nick:
+            return False
+        await guild.me.edit(nick=nick)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "saved": self.saved,
+            **{name: slot.stats() for name, slot in self.slots.items()},
+        }
+
+    def __repr__(self) -> str:
+        return f"<PresenceScheduler saved={self.saved}>"
@@ -0,0 +1,86 @@
+import asyncio
+import cProfile
+import io
+import logging
+import marshal
+import pstats
+import time
+import tracemalloc
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+class SlowCallbackRecorder(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__(logging.WARNING)
+        self.records: list = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # asyncio debug mode logs "Executing <Handle ...> took 0.123 seconds"
+        if isinstance(record.msg, str) and record.msg.startswith("Executing"):
+            self.records.append(record.getMessage())
+
+
+class LoopProfiler:
+    def __init__(self, top: int = 30, frames: int = 10) -> None:
+        self.top = top
+        self.frames = frames
+        self._lock = asyncio.Lock()
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    async def run(self, duration: float, slow_callback: float = 0.1) -> tuple:
+        if self.busy:
+            raise ProfilerBusy("a profiling session is already running")
+        async with self._lock:
+            return await self._run(duration, slow_callback)
+
+    async def _run(self, duration: float, slow_callback: float) -> tuple:
+        loop = asyncio.get_running_loop()
+        asyncio_logger = logging.getLogger("asyncio")
+        recorder = SlowCallbackRecorder()
+        debug, threshold = loop.get_debug(), loop.slow_callback_duration
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(self.frames)
+        before = tracemalloc.take_snapshot()
+        asyncio_logger.addHandler(recorder)
+        loop.set_debug(True)
+        loop.slow_callback_duration = slow_callback
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            profile.disable()
+            elapsed = time.perf_counter() - start
+            loop.set_debug(debug)
+            loop.slow_callback_duration = threshold
+            asyncio_logger.removeHandler(recorder)
+            after = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+        profile.create_stats()
+        # pstats.Stats() takes ownership of profile.stats, so dump them first.
+        dump = marshal.dumps(profile.stats)
+        report = self._report(profile, before, after, recorder.records, elapsed, slow_callback)
+        return report, dump
+
+    def _report(self, profile, before, after, slow_callbacks, elapsed, slow_callback) -> str:
+        out = io.StringIO()
+        out.write(f"Profiled the event loop for {elapsed:.1f}s\n\n")
+        for sort in ("cumulative", "tottime"):
+            out.write(f"== Top {self.top} by {sort} ==\n")
+            pstats.Stats(profile, stream=out).strip_dirs().sort_stats(sort).print_stats(self.top)
+        out.write(f"== Allocation growth, top {self.top} ==\n")
+        for stat in after.compare_to(before, "lineno")[: self.top]:
+            out.write(f"{stat}\n")
+        out.write(f"\n== Callbacks slower than {slow_callback * 1000:.0f}ms: {len(slow_callbacks)} ==\n")
+        for record in slow_callbacks:
+            out.write(f"{record}\n")
+        return out.getvalue()
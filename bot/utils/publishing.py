@@ -0,0 +1,127 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+
+import aiohttp
+import nextcord
+
+from utils.announcements import PublishJob, PublishQueue
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, nextcord.HTTPException):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers["Retry-After"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class Publisher:
+    def __init__(
+        self,
+        queue: PublishQueue,
+        publish: Callable[[PublishJob], Awaitable[int]],
+        channel_of: Callable[[PublishJob], object] = lambda job: job.target,
+        per_channel: int = 1,
+        max_attempts: int = 5,
+        retry_delay: float = 5.0,
+        max_retry_delay: float = 600.0,
+        batch_size: int = 20,
+        settled: Optional[Callable[[PublishJob, dict], Awaitable[None]]] = None,
+    ) -> None:
+        self.queue = queue
+        self.publish = publish
+        self.channel_of = channel_of
+        self.per_channel = per_channel
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.batch_size = batch_size
+        self.settled = settled
+        self._semaphores: dict = {}
+        self._settled_batches: set = set()
+        self._tasks: set = set()
+        self.published = 0
+        self.retried = 0
+        self.failed = 0
+
+    def _semaphore(self, channel) -> asyncio.Semaphore:
+        if channel not in self._semaphores:
+            self._semaphores[channel] = asyncio.Semaphore(self.per_channel)
+        return self._semaphores[channel]
+
+    def backoff(self, attempts: int, error: BaseException) -> float:
+        delay = min(self.max_retry_delay, self.retry_delay * 2**attempts)
+        return max(delay, retry_after(error) or 0.0)
+
+    async def run_due(self) -> int:
+        jobs = await self.queue.claim_due(datetime.now(timezone.utc), self.batch_size)
+        for job in jobs:
+            task = asyncio.create_task(self._run(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return len(jobs)
+
+    async def _run(self, job: PublishJob) -> None:
+        async with self._semaphore(self.channel_of(job)):
+            try:
+                message_id = await self.publish(job)
+            except Exception as e:
+                error = f"{e.__class__.__name__}: {e}"
+                if is_retryable(e) and job.attempts + 1 < self.max_attempts:
+                    self.retried += 1
+                    delay = self.backoff(job.attempts, e)
+                    await self.queue.retry(
+                        job.id, datetime.now(timezone.utc) + timedelta(seconds=delay), error
+                    )
+                    print(
+                        f"Publishing job #{job.batch_id} to {job.target} failed,",
+                        f"retrying in {delay:.0f}s:",
+                        error,
+                    )
+                else:
+                    self.failed += 1
+                    await self.queue.fail(job.id, error)
+                    print(f"Publishing job #{job.batch_id} to {job.target} failed:", error)
+                    await self._check_settled(job)
+            else:
+                self.published += 1
+                await self.queue.complete(job.id, message_id)
+                await self._check_settled(job)
+
+    async def _check_settled(self, job: PublishJob) -> None:
+        if self.settled is None or job.batch_id in self._settled_batches:
+            return
+        batch = await self.queue.batch_status(job.batch_id)
+        if any(entry["status"] not in ("done", "failed") for entry in batch.values()):
+            return
+        # Jobs of one batch can finish concurrently; only report the batch once.
+        if job.batch_id in self._settled_batches:
+            return
+        self._settled_batches.add(job.batch_id)
+        try:
+            await self.settled(job, batch)
+        except Exception as e:
+            print(f"Finishing job #{job.batch_id} failed:", e)
+
+    async def drain(self) -> None:
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "running": len(self._tasks),
+            "published": self.published,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+    def __repr__(self) -> str:
+        return f"<Publisher {self.stats()}>"
@@ -0,0 +1,108 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from utils.config import KEY, Config, Generation
+
+SCOPES = ("user", "channel", "global")
+
+
+class TokenBuckets:
+    __slots__ = ("capacity", "refill", "ttl", "maxsize", "buckets", "evicted")
+
+    def __init__(self, rate: float, per: float, maxsize: int = 10000) -> None:
+        self.capacity = float(rate)
+        self.refill = rate / per
+        # An idle bucket is full again after `per` seconds, which is the same as not having one.
+        self.ttl = float(per)
+        self.maxsize = maxsize
+        self.buckets: OrderedDict = OrderedDict()
+        self.evicted = 0
+
+    def _evict(self, now: float) -> None:
+        buckets = self.buckets
+        while buckets:
+            key, (_, updated) = next(iter(buckets.items()))
+            if now - updated < self.ttl and len(buckets) <= self.maxsize:
+                return
+            del buckets[key]
+            self.evicted += 1
+
+    def peek(self, key, now: float) -> float:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            return 0.0
+        tokens = min(self.capacity, bucket[0] + (now - bucket[1]) * self.refill)
+        return 0.0 if tokens >= 1.0 else (1.0 - tokens) / self.refill
+
+    def take(self, key, now: float) -> None:
+        bucket = self.buckets.pop(key, None)
+        if bucket is None:
+            tokens = self.capacity
+        else:
+            tokens = min(self.capacity, bucket[0] + (now - bucket[1]) * self.refill)
+        self.buckets[key] = (tokens - 1.0, now)
+        self._evict(now)
+
+    def __len__(self) -> int:
+        return len(self.buckets)
+
+    def __repr__(self) -> str:
+        return f"<TokenBuckets {len(self.buckets)}/{self.maxsize} {self.capacity:g}/{self.ttl:g}s>"
+
+
+class RateLimiter:
+    def __init__(self, config: Config, generation: Generation) -> None:
+        self.config = config
+        self.generation = generation
+        self._limits: dict = {}
+        self._limits_generation = None
+        self.allowed = 0
+        self.rejected = 0
+
+    def rebuild(self) -> None:
+        section = self.config.gobj(KEY.features.rate_limits(), {})
+        maxsize = section.get("max-keys", 10000)
+        limits = {}
+        for name, scopes in section.items():
+            if not isinstance(scopes, dict):
+                continue
+            limits[name] = tuple(
+                (scope, TokenBuckets(scopes[scope]["rate"], scopes[scope]["per"], maxsize))
+                for scope in SCOPES
+                if scope in scopes
+            )
+        self._limits = limits
+        self._limits_generation = self.generation.value
+
+    def check(self, name: str, user_id: int, channel_id: Optional[int]) -> float:
+        if self._limits_generation != self.generation.value:
+            self.rebuild()
+        limits = self._limits.get(name)
+        if not limits:
+            return 0.0
+        now = time.monotonic()
+        keys = {"user": user_id, "channel": channel_id, "global": None}
+        retry_after = 0.0
+        for scope, buckets in limits:
+            retry_after = max(retry_after, buckets.peek(keys[scope], now))
+        if retry_after:
+            self.rejected += 1
+            return retry_after
+        for scope, buckets in limits:
+            buckets.take(keys[scope], now)
+        self.allowed += 1
+        return 0.0
+
+    def stats(self) -> dict:
+        return {
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "buckets": {
+                name: {scope: len(buckets) for scope, buckets in limits}
+                for name, limits in self._limits.items()
+            },
+        }
+
+    def __repr__(self) -> str:
+        return f"<RateLimiter limits={list(self._limits)}>"
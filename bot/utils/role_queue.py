@@ -0,0 +1,108 @@
+import asyncio
+import time
+from typing import Optional
+
+import nextcord
+
+
+class RoleQueue:
+    def __init__(self, http, window: float = 1.0, concurrency: int = 4) -> None:
+        self.http = http
+        self.window = window
+        self.concurrency = concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pending: dict = {}
+        self._tasks: dict = {}
+        self._done: dict = {}
+        self.queued = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.failures = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self.total_flush_latency = 0.0
+
+    # The returned future resolves once the change was sent, to the error if it failed.
+    def add(self, guild: nextcord.Guild, member_id: int, role_id: int) -> asyncio.Future:
+        return self._queue(guild, member_id, role_id, True)
+
+    def remove(self, guild: nextcord.Guild, member_id: int, role_id: int) -> asyncio.Future:
+        return self._queue(guild, member_id, role_id, False)
+
+    def _queue(self, guild: nextcord.Guild, member_id: int, role_id: int, add: bool) -> asyncio.Future:
+        key = (guild.id, member_id)
+        pending = self._pending.setdefault(key, {})
+        if role_id in pending:
+            self.coalesced += 1
+        pending[role_id] = add
+        self.queued += 1
+        if key not in self._tasks:
+            self._done[key] = asyncio.get_running_loop().create_future()
+            self._tasks[key] = asyncio.create_task(
+                self._flush_later(guild, member_id, time.perf_counter())
+            )
+        return self._done[key]
+
+    async def _flush_later(self, guild: nextcord.Guild, member_id: int, queued_at: float) -> None:
+        key = (guild.id, member_id)
+        done = self._done[key]
+        error = None
+        try:
+            await asyncio.sleep(self.window)
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.concurrency)
+            async with self._semaphore:
+                self._tasks.pop(key, None)
+                self._done.pop(key, None)
+                changes = self._pending.pop(key, {})
+                try:
+                    await self._apply(guild, member_id, changes)
+                except Exception as e:
+                    error = e
+                    self.failures += 1
+                    print("Role change for", member_id, "failed:", e)
+                finally:
+                    latency = time.perf_counter() - queued_at
+                    self.flushes += 1
+                    self.last_flush_latency = latency
+                    self.max_flush_latency = max(self.max_flush_latency, latency)
+                    self.total_flush_latency += latency
+        finally:
+            if not done.done():
+                done.set_result(error)
+
+    async def _apply(self, guild: nextcord.Guild, member_id: int, changes: dict) -> None:
+        member = guild.get_member(member_id)
+        if member is None:
+            for role_id, add in changes.items():
+                if add:
+                    await self.http.add_role(guild.id, member_id, role_id)
+                else:
+                    await self.http.remove_role(guild.id, member_id, role_id)
+            return
+        current = {role.id for role in member.roles if role.id != guild.id}
+        wanted = {role_id for role_id, add in changes.items() if add}
+        unwanted = {role_id for role_id, add in changes.items() if not add}
+        roles = (current | wanted) - unwanted
+        if roles == current:
+            self.dropped += len(changes)
+            return
+        await member.edit(roles=[nextcord.Object(role_id) for role_id in roles])
+
+    def stats(self) -> dict:
+        return {
+            "depth": len(self._pending),
+            "pending-changes": sum(len(changes) for changes in self._pending.values()),
+            "queued": self.queued,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "last-flush-latency": self.last_flush_latency,
+            "max-flush-latency": self.max_flush_latency,
+            "avg-flush-latency": self.total_flush_latency / self.flushes if self.flushes else 0.0,
+        }
+
+    def __repr__(self) -> str:
+        return f"<RoleQueue {self.stats()}>"
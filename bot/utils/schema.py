@@ -0,0 +1,197 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from utils.config import KEY, Config
+
+ACTIVITY_TYPES = ("playing", "listening", "watching", "streaming")
+
+
+class ConfigError(ValueError):
+    def __init__(self, key: str, problem: str) -> None:
+        super().__init__(f"{key}: {problem}")
+        self.key = key
+        self.problem = problem
+
+
+@dataclass(frozen=True, slots=True)
+class AnnounceTarget:
+    name: str
+    channel_id: int
+    ping_role_id: int
+    allowed_role_ids: frozenset
+
+
+@dataclass(frozen=True, slots=True)
+class ReactRole:
+    emoji: str
+    role_id: int
+    description: str
+
+
+@dataclass(frozen=True, slots=True)
+class ReactRoles:
+    channel_id: Optional[int]
+    message_id: Optional[int]
+    roles: tuple
+    roles_by_emoji: Mapping[str, int]
+
+
+@dataclass(frozen=True, slots=True)
+class Activity:
+    type: str
+    name: Optional[str]
+    url: Optional[str]
+
+
+@dataclass(frozen=True, slots=True)
+class Profile:
+    activities: tuple
+    names: tuple
+    nicks: tuple
+    intervals: Mapping[str, float]
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    guild_id: int
+    admin_role_id: int
+    trusted_role_id: Optional[int]
+    new_member_role_id: Optional[int]
+    off_topic_channel_id: Optional[int]
+    announce: Mapping[str, AnnounceTarget]
+    announce_by_channel: Mapping[int, AnnounceTarget]
+    react_roles: ReactRoles
+    profile: Profile
+
+
+def _require(value, expected, key: str):
+    if not isinstance(value, expected) or isinstance(value, bool):
+        names = getattr(expected, "__name__", None) or " or ".join(t.__name__ for t in expected)
+        raise ConfigError(key, f"expected {names}, got {type(value).__name__}")
+    return value
+
+
+def _optional(value, expected, key: str):
+    return None if value is None else _require(value, expected, key)
+
+
+def _id_map(config: Config, key: str) -> dict:
+    mapping = _require(config.gobj(key), dict, key)
+    for name, value in mapping.items():
+        _require(value, int, f"{key}.{name}")
+    return mapping
+
+
+def _compile_announce(config: Config, roles: dict, channels: dict, admin_role_id: int) -> dict:
+    targets = {}
+    key = KEY.commands.announce()
+    for name, entry in _require(config.gobj(key), dict, key).items():
+        entry_key = f"{key}.{name}"
+        _require(entry, dict, entry_key)
+        channel = entry.get("channel")
+        if channel not in channels:
+            raise ConfigError(f"{entry_key}.channel", f"unknown channel {channel!r}")
+        ping_role = entry.get("ping-role")
+        if ping_role not in roles:
+            raise ConfigError(f"{entry_key}.ping-role", f"unknown role {ping_role!r}")
+        senders = _require(entry.get("allowed-senders", []), list, f"{entry_key}.allowed-senders")
+        for sender in senders:
+            if sender not in roles:
+                raise ConfigError(f"{entry_key}.allowed-senders", f"unknown role {sender!r}")
+        targets[name] = AnnounceTarget(
+            name=name,
+            channel_id=channels[channel],
+            ping_role_id=roles[ping_role],
+            allowed_role_ids=frozenset({admin_role_id, *(roles[sender] for sender in senders)}),
+        )
+    return targets
+
+
+def _compile_react_roles(config: Config) -> ReactRoles:
+    key = KEY.features.react_roles()
+    entries = []
+    for index, entry in enumerate(_require(config.glist(f"{key}.roles", []), list, f"{key}.roles")):
+        entry_key = f"{key}.roles.{index}"
+        _require(entry, dict, entry_key)
+        entries.append(
+            ReactRole(
+                emoji=_require(entry.get("emoji"), str, f"{entry_key}.emoji"),
+                role_id=_require(entry.get("role"), int, f"{entry_key}.role"),
+                description=_require(entry.get("description", ""), str, f"{entry_key}.description"),
+            )
+        )
+    return ReactRoles(
+        channel_id=_optional(config.gobj(f"{key}.channel", None), int, f"{key}.channel"),
+        message_id=_optional(config.gobj(f"{key}.message", None), int, f"{key}.message"),
+        roles=tuple(entries),
+        roles_by_emoji=MappingProxyType({entry.emoji: entry.role_id for entry in entries}),
+    )
+
+
+def _compile_profile(config: Config) -> Profile:
+    key = KEY.profile()
+    activities = []
+    for index, entry in enumerate(_require(config.glist(f"{key}.activities", []), list, f"{key}.activities")):
+        entry_key = f"{key}.activities.{index}"
+        _require(entry, dict, entry_key)
+        if entry.get("type") not in ACTIVITY_TYPES:
+            raise ConfigError(f"{entry_key}.type", f"expected one of {', '.join(ACTIVITY_TYPES)}")
+        activities.append(
+            Activity(
+                type=entry["type"],
+                name=_optional(entry.get("name"), str, f"{entry_key}.name"),
+                url=_optional(entry.get("url"), str, f"{entry_key}.url"),
+            )
+        )
+    pools = {}
+    for pool in ("names", "nicks"):
+        values = _require(config.glist(f"{key}.{pool}", []), list, f"{key}.{pool}")
+        pools[pool] = tuple(_require(value, str, f"{key}.{pool}") for value in values)
+    intervals = _require(config.gobj(f"{key}.intervals", {}), dict, f"{key}.intervals")
+    for name, value in intervals.items():
+        _require(value, (int, float), f"{key}.intervals.{name}")
+    return Profile(
+        activities=tuple(activities),
+        names=pools["names"],
+        nicks=pools["nicks"],
+        intervals=MappingProxyType(dict(intervals)),
+    )
+
+
+def compile_settings(config: Config) -> Settings:
+    roles = _id_map(config, KEY.roles())
+    channels = _id_map(config, KEY.channels())
+    if "admin" not in roles:
+        raise ConfigError(KEY.roles.admin(), "missing")
+    announce = _compile_announce(config, roles, channels, roles["admin"])
+    announce_by_channel = {}
+    for target in announce.values():
+        announce_by_channel.setdefault(target.channel_id, target)
+    return Settings(
+        guild_id=_require(config.gint(KEY.guild(), None), int, KEY.guild()),
+        admin_role_id=roles["admin"],
+        trusted_role_id=roles.get("trusted"),
+        new_member_role_id=roles.get("new-member"),
+        off_topic_channel_id=channels.get("off-topic"),
+        announce=MappingProxyType(announce),
+        announce_by_channel=MappingProxyType(announce_by_channel),
+        react_roles=_compile_react_roles(config),
+        profile=_compile_profile(config),
+    )
+
+
+class CompiledSettings:
+    def __init__(self, config: Config) -> None:
+        self.config = config
+        self.current: Settings = compile_settings(config)
+
+    def recompile(self) -> Settings:
+        self.current = compile_settings(self.config)
+        return self.current
+
+    def __getattr__(self, name: str):
+        return getattr(self.current, name)
+
+    def __repr__(self) -> str:
+        return f"<CompiledSettings {self.current!r}>"
@@ -0,0 +1,157 @@
+from bisect import bisect_left
+from typing import Optional
+
+import nextcord
+
+from utils.config import Config, Generation
+from utils.general import compile_string, format_string
+
+
+class CachedTag:
+    def __init__(self, name: str, content: str | dict) -> None:
+        self.name = name
+        self.is_embed = isinstance(content, dict)
+        self.template = None
+        self.message = None
+        self.embed = None
+        if not self.is_embed:
+            self.template = compile_string(content)
+            return
+        self.message = (
+            format_string(t) if (t := content.get("message")) is not None else None
+        )
+        embed = nextcord.Embed()
+        embed.title = content.get("title")
+        embed.description = (
+            format_string(t) if (t := content.get("content")) is not None else None
+        )
+        embed.colour = nextcord.Colour.blurple()
+        embed.set_image(url=content.get("image"))
+        embed.set_thumbnail(url=content.get("thumbnail"))
+        if "author" in content:
+            embed.set_author(
+                name=content.get("author"), icon_url=content.get("author-icon")
+            )
+        self.embed = embed
+
+    def render(self, sender: Optional[str] = None) -> str:
+        return self.template.render(sender)
+
+    def render_embed(self, footer: str, icon_url: Optional[str], timestamp) -> nextcord.Embed:
+        embed = self.embed.copy()
+        embed.set_footer(text=footer, icon_url=icon_url)
+        embed.timestamp = timestamp
+        return embed
+
+    def __repr__(self) -> str:
+        return f"<CachedTag {self.name} embed={self.is_embed}>"
+
+
+class TagCache:
+    def __init__(self, tags: Config, generation: Generation) -> None:
+        self.tags = tags
+        self.generation = generation
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict = {}
+        self._entries_generation = generation.value
+
+    def _current(self) -> dict:
+        if self._entries_generation != self.generation.value:
+            self._entries, self._entries_generation = {}, self.generation.value
+        return self._entries
+
+    def get(self, name: str) -> Optional[CachedTag]:
+        entries = self._current()
+        if name in entries:
+            self.hits += 1
+            return entries[name]
+        self.misses += 1
+        content = self.tags.data.get(name)
+        if not isinstance(content, (str, dict)):
+            return None
+        entry = entries[name] = CachedTag(name, content)
+        return entry
+
+    def stats(self) -> dict:
+        return {
+            "generation": self._entries_generation,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def __repr__(self) -> str:
+        return f"<TagCache {self.stats()}>"
+
+
+class TagIndex:
+    def __init__(self, tags: Config, generation: Generation, limit: int = 25) -> None:
+        self.tags = tags
+        self.generation = generation
+        self.limit = limit
+        self._names: list = []
+        self._folded: list = []
+        self._index_generation = None
+
+    def rebuild(self) -> None:
+        names = sorted(name for name in self.tags.data if isinstance(name, str))
+        folded = sorted((name.casefold(), name) for name in names)
+        self._names, self._folded = names, folded
+        self._index_generation = self.generation.value
+
+    def _ensure_current(self) -> None:
+        if self._index_generation != self.generation.value:
+            self.rebuild()
+
+    def complete(
+        self, prefix: str, case_insensitive: bool = True, fuzzy: bool = False
+    ) -> list:
+        self._ensure_current()
+        if case_insensitive:
+            folded_prefix = prefix.casefold()
+            keys, needle = self._folded, (folded_prefix,)
+            position = bisect_left(keys, needle)
+            matches = []
+            while (
+                position < len(keys)
+                and len(matches) < self.limit
+                and keys[position][0].startswith(folded_prefix)
+            ):
+                matches.append(keys[position][1])
+                position += 1
+        else:
+            keys = self._names
+            position = bisect_left(keys, prefix)
+            matches = []
+            while (
+                position < len(keys)
+                and len(matches) < self.limit
+                and keys[position].startswith(prefix)
+            ):
+                matches.append(keys[position])
+                position += 1
+        if fuzzy and prefix and len(matches) < self.limit:
+            matches.extend(self._substring_matches(prefix, case_insensitive, matches))
+        return matches
+
+    def _substring_matches(self, needle: str, case_insensitive: bool, found: list) -> list:
+        if case_insensitive:
+            needle = needle.casefold()
+            candidates = self._folded
+        else:
+            candidates = ((name, name) for name in self._names)
+        found = set(found)
+        matches = []
+        remaining = self.limit - len(found)
+        for key, name in candidates:
+            if remaining <= 0:
+                break
+            if needle in key and name not in found:
+                matches.append(name)
+                remaining -= 1
+        return matches
+
+    def __len__(self) -> int:
+        self._ensure_current()
+        return len(self._names)